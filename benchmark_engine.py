@@ -0,0 +1,236 @@
+"""Benchmarks for the invoice calculations across modes and row counts.
+
+Synthetic invoices of every mode are generated from a fixed seed as the
+text a cashier types (blanks, decimals, the odd ₹ sign) and recalculated
+in each of these ways:
+
+    scalar       ``calculate_row`` once per row, as the apps did per keystroke
+    incremental  one cell edit + ``RowModel.recalculate`` per row, the live table path
+    batch        ``calculate_invoice`` over the whole invoice, totals included
+    vector       ``invoice_vector.calculate_rows``, when NumPy is installed
+
+Each run reports rows per second and p50/p99 latency (per row for scalar
+and incremental, per invoice for batch and vector) and is written as
+JSON. With ``--baseline`` the run is compared against an earlier result
+file and exits 1 if any case lost more than ``--tolerance`` of its
+throughput, so a slower hot path is caught before it reaches the counter.
+
+Usage:
+    python benchmark_engine.py [--sizes 10 100 ...] [--modes Patti ...]
+        [--repeat N] [--output PATH] [--baseline PATH] [--tolerance 0.2]
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+from invoice_engine import MODES, calculate_invoice, calculate_row
+from modes import MODE_SPECS
+from row_model import RowModel
+
+try:
+    import invoice_vector
+except ImportError:  # NumPy is optional
+    invoice_vector = None
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+# Field the incremental case edits in each mode: one that every row's amount depends on
+EDITED_FIELDS = {"Patti": "quantity", "Kata": "net_weight", "Barthe": "weight"}
+DEFAULT_REPEAT = 5
+DEFAULT_OUTPUT = "benchmark_results.json"
+DEFAULT_TOLERANCE = 0.2
+SEED = 2024
+
+ITEMS = ["Rice", "Wheat", "Jowar", "Bajra", "Tur Dal", "Chana", "Sugar", "Groundnut"]
+
+# Plausible typed values per field unit
+UNIT_VALUES = {
+    "count": lambda rng: str(rng.randint(1, 40)),
+    "weight": lambda rng: f"{rng.uniform(0.5, 2500):.{rng.choice((0, 1, 3))}f}",
+    "money": lambda rng: rng.choice(("", "₹")) + f"{rng.uniform(5, 150):.2f}",
+    "percent": lambda rng: rng.choice(("", "0", "1", "1.5", "2.25")),
+}
+
+
+def generate_rows(mode, count, seed=SEED):
+    """Synthetic invoice rows for ``mode``: item, then one text per field."""
+    rng = random.Random(f"{seed}-{mode}-{count}")
+    units = [field["unit"] for field in MODE_SPECS[mode]["fields"]]
+    rows = []
+    for _ in range(count):
+        row = [rng.choice(ITEMS)] + [UNIT_VALUES[unit](rng) for unit in units]
+        if rng.random() < 0.05:
+            row[rng.randrange(1, len(row))] = ""  # a cell not filled in yet
+        rows.append(row)
+    return rows
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of ``samples`` (seconds)."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summary(rows, elapsed, samples):
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 6),
+        "rows_per_second": round(rows / elapsed) if elapsed else None,
+        "p50_us": round(percentile(samples, 0.50) * 1e6, 2),
+        "p99_us": round(percentile(samples, 0.99) * 1e6, 2),
+    }
+
+
+def bench_scalar(mode, rows):
+    """Time ``calculate_row`` on every row separately."""
+    clock = time.perf_counter
+    samples = []
+    append = samples.append
+    started = clock()
+    for row in rows:
+        before = clock()
+        calculate_row(mode, row)
+        append(clock() - before)
+    return _summary(len(rows), clock() - started, samples)
+
+
+def bench_incremental(mode, rows):
+    """Time one edited cell plus recalculation per row, keeping a running total.
+
+    The edit sets the row's quantity (or weight) to the next whole number,
+    so the parsed value always changes and every row really recalculates.
+    """
+    models = []
+    for row in rows:
+        model = RowModel(mode)
+        model.load(row[0], row[1:])
+        model.recalculate()
+        models.append(model)
+    index = MODES[mode].field_names.index(EDITED_FIELDS[mode])
+    scale = MODES[mode].scales[index]
+    edits = [str(model.values[index] // scale + 1) for model in models]
+    clock = time.perf_counter
+    samples = []
+    append = samples.append
+    total = 0
+    started = clock()
+    for model, text in zip(models, edits):
+        before = clock()
+        changed = model.set_text(index, text)
+        total += model.recalculate()
+        append(clock() - before)
+        assert changed, f"{mode} edit to {text!r} did not change the row"
+    return _summary(len(rows), clock() - started, samples)
+
+
+def bench_batch(mode, rows, repeat):
+    """Time ``calculate_invoice`` over the whole invoice, ``repeat`` times."""
+    return _bench_whole(lambda: calculate_invoice(mode, rows, "0"), len(rows), repeat)
+
+
+def bench_vector(mode, rows, repeat):
+    """Time the NumPy path, parsing included, ``repeat`` times."""
+    return _bench_whole(lambda: invoice_vector.calculate_rows(mode, rows).total(), len(rows), repeat)
+
+
+def _bench_whole(run, count, repeat):
+    clock = time.perf_counter
+    samples = []
+    for _ in range(repeat):
+        before = clock()
+        run()
+        samples.append(clock() - before)
+    return _summary(count * repeat, sum(samples), samples)
+
+
+def run_benchmarks(modes, sizes, repeat=DEFAULT_REPEAT):
+    """Run every strategy for every mode and size.
+
+    Returns:
+        dict: Environment info plus a list of result cases.
+    """
+    cases = []
+    for mode in modes:
+        for size in sizes:
+            rows = generate_rows(mode, size)
+            strategies = [
+                ("scalar", lambda: bench_scalar(mode, rows)),
+                ("incremental", lambda: bench_incremental(mode, rows)),
+                ("batch", lambda: bench_batch(mode, rows, repeat)),
+            ]
+            if invoice_vector is not None:
+                strategies.append(("vector", lambda: bench_vector(mode, rows, repeat)))
+            for strategy, bench in strategies:
+                result = bench()
+                result.update(mode=mode, size=size, strategy=strategy)
+                cases.append(result)
+                logging.info(
+                    f"{mode:<7} {size:>7} rows {strategy:<11} "
+                    f"{result['rows_per_second']:>10} rows/s  "
+                    f"p50 {result['p50_us']:>10} us  p99 {result['p99_us']:>10} us"
+                )
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": invoice_vector is not None,
+        "repeat": repeat,
+        "cases": cases,
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Cases whose throughput fell more than ``tolerance`` below the baseline.
+
+    Returns:
+        list: ``(mode, size, strategy, baseline_rps, current_rps)`` tuples.
+    """
+    previous = {
+        (case["mode"], case["size"], case["strategy"]): case["rows_per_second"]
+        for case in baseline.get("cases", [])
+    }
+    slower = []
+    for case in results["cases"]:
+        key = (case["mode"], case["size"], case["strategy"])
+        before = previous.get(key)
+        if before and case["rows_per_second"] < before * (1 - tolerance):
+            slower.append(key + (before, case["rows_per_second"]))
+    return slower
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Benchmark the invoice calculations.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Rows per invoice")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES), help="Modes to run")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per batch case")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"Result file (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--baseline", default=None, help="Earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed throughput loss against the baseline (default: 0.2)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.modes, args.sizes, args.repeat)
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(results, handle, indent=2)
+    logging.info(f"Wrote {len(results['cases'])} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            slower = compare(results, json.load(handle), args.tolerance)
+        for mode, size, strategy, before, now in slower:
+            logging.error(f"Regression: {mode} {size} rows {strategy}: {before} -> {now} rows/s")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""In-memory customer directory with fuzzy type-ahead.
+
+``recent_customers.json`` kept the last ten names and was read back from
+disk on every save, so a regular farmer who had not come in for a while
+had to be typed out in full. ``CustomerDirectory`` is loaded once at
+startup from everything already known:
+
+    history    every customer in the invoice store, with invoice count
+               and last invoice date
+    legacy     names from an old ``recent_customers.json``, imported once
+    picks      ``customers.jsonl`` next to the ledger, one line per
+               customer picked at the counter, replayed in order
+
+and kept in three indexes:
+
+    customers  normalised name -> entry (display name, last used, counts)
+    prefixes   every prefix of every word and of the whole name -> keys,
+               so "ram" finds "Ramesh Patil" and "Patil Ramappa" by lookup
+    trigrams   three-character pieces of the name -> keys, for typos and
+               spelling variants ("shivapa" still finds "Shivappa")
+
+Results are ranked by match kind, then by when the customer was last
+used, then by how often. Picking a customer appends one line to the log;
+nothing is read back. Kannada names are indexed the same way as English
+ones, by code point.
+"""
+import json
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+
+from invoice_store import STORE_FILENAME, InvoiceStore
+from journal import atomic_replace
+from ledger import default_documents_dir
+
+CUSTOMER_LOG_FILENAME = "customers.jsonl"
+LEGACY_RECENT_FILENAME = "recent_customers.json"
+PLACEHOLDER_NAMES = ("Unknown Customer", "N/A")
+MIN_TRIGRAM_SCORE = 0.4  # share of the typed text's trigrams a fuzzy match must have
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # same as the invoice store, so times compare as text
+
+
+def normalise(name):
+    """Lookup key for ``name``: case-folded with runs of whitespace collapsed."""
+    return " ".join(name.split()).casefold()
+
+
+def trigrams(key):
+    """Three-character pieces of ``key``, padded so word starts count double."""
+    padded = f"  {key} "
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+class CustomerDirectory:
+    """Every known customer, indexed for type-ahead.
+
+    Args:
+        path (str): Pick log (default: Documents/customers.jsonl).
+        store_path (str): Invoice store to load the history from (default:
+            Documents/invoices.db); skipped if it does not exist yet.
+        legacy_path (str): Old recent-customers list to import, if present.
+    """
+
+    def __init__(self, path=None, store_path=None, legacy_path=LEGACY_RECENT_FILENAME):
+        self.path = path or os.path.join(default_documents_dir(), CUSTOMER_LOG_FILENAME)
+        self._customers = {}  # key -> {"name", "last_used", "invoices", "picks"}
+        self._prefixes = {}   # prefix -> keys
+        self._trigrams = {}   # trigram -> keys
+        self._logged = 0      # lines in the pick log
+        self._placeholders = {normalise(name) for name in PLACEHOLDER_NAMES}
+        self._load_history(store_path)
+        self._load_legacy(legacy_path)
+        self._replay()
+
+    def _load_history(self, store_path):
+        store_path = store_path or os.path.join(default_documents_dir(), STORE_FILENAME)
+        if not os.path.exists(store_path):
+            return
+        try:
+            store = InvoiceStore(store_path)
+            try:
+                for row in store.customer_history():
+                    self._record(row["customerName"], row["lastDate"] or "", invoices=row["invoices"])
+            finally:
+                store.close()
+        except Exception as e:
+            logging.error(f"Could not load customers from {store_path}: {e}")
+
+    def _load_legacy(self, legacy_path):
+        if not legacy_path or not os.path.exists(legacy_path) or os.path.exists(self.path):
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                names = json.load(f)
+            used = datetime.fromtimestamp(os.path.getmtime(legacy_path)).strftime(TIME_FORMAT)
+        except (ValueError, OSError) as e:
+            logging.error(f"Could not import recent customers from {legacy_path}: {e}")
+            return
+        # The list is oldest first; the file's time is all we know of when they came
+        for name in names if isinstance(names, list) else ():
+            if isinstance(name, str):
+                self._record(name, used, picks=1)
+        self._compact()
+
+    def _replay(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._logged += 1
+                    try:
+                        record = json.loads(line)
+                        self._record(record["name"], record["used"], picks=record.get("picks", 1))
+                    except (ValueError, KeyError, TypeError):
+                        # A line torn by a crash mid-append; the rest of the log is fine
+                        logging.warning(f"Skipping unreadable line {self._logged} of {self.path}")
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logging.error(f"Could not read customer log {self.path}: {e}")
+            return
+        if self._logged > 2 * len(self._customers) + 100:
+            self._compact()
+
+    def _record(self, name, used, invoices=0, picks=0):
+        name = " ".join(str(name).split())
+        key = name.casefold()
+        if not key or key in self._placeholders:
+            return None
+        entry = self._customers.get(key)
+        if entry is None:
+            entry = {"name": name, "last_used": used, "invoices": 0, "picks": 0}
+            self._customers[key] = entry
+            self._index(key)
+        elif used > entry["last_used"]:
+            entry["last_used"] = used  # the first spelling seen stays the display name
+        entry["invoices"] += invoices
+        entry["picks"] += picks
+        return entry
+
+    def _index(self, key):
+        prefixes = {key[:end] for end in range(1, len(key) + 1)}
+        for word in key.split():
+            prefixes.update(word[:end] for end in range(1, len(word) + 1))
+        for prefix in prefixes:
+            self._prefixes.setdefault(prefix, set()).add(key)
+        for trigram in trigrams(key):
+            self._trigrams.setdefault(trigram, set()).add(key)
+
+    def __len__(self):
+        return len(self._customers)
+
+    def __contains__(self, name):
+        return normalise(name) in self._customers
+
+    def _rank(self, key):
+        entry = self._customers[key]
+        return entry["last_used"], entry["invoices"] + entry["picks"]
+
+    def search(self, text, limit=8):
+        """Customers matching ``text``, best first.
+
+        Names starting with ``text`` come first, then names with a word
+        starting with it, then fuzzy (trigram) matches; within each group
+        the most recently used customer leads.
+
+        Returns:
+            list: Up to ``limit`` display names; the most recent customers
+            for blank text.
+        """
+        key = normalise(text)
+        if not key:
+            keys = sorted(self._customers, key=self._rank, reverse=True)
+            return [self._customers[k]["name"] for k in keys[:limit]]
+        hits = self._prefixes.get(key, set())
+        ranked = sorted(hits, key=self._rank, reverse=True)
+        ranked.sort(key=lambda k: not k.startswith(key))  # stable: recency kept within each group
+        if len(ranked) < limit and len(key) >= 3:
+            wanted = trigrams(key)
+            shared = Counter()
+            for trigram in wanted:
+                shared.update(self._trigrams.get(trigram, ()))
+            fuzzy = [
+                k for k, count in shared.items()
+                if k not in hits and count >= MIN_TRIGRAM_SCORE * len(wanted)
+            ]
+            fuzzy.sort(key=self._rank, reverse=True)
+            fuzzy.sort(key=lambda k: shared[k], reverse=True)
+            ranked.extend(fuzzy)
+        return [self._customers[k]["name"] for k in ranked[:limit]]
+
+    def complete(self, text):
+        """The most recent customer whose name starts with ``text``, or None."""
+        key = normalise(text)
+        if not key:
+            return None
+        best = None
+        for candidate in self._prefixes.get(key, ()):
+            if candidate.startswith(key) and (best is None or self._rank(candidate) > self._rank(best)):
+                best = candidate
+        return None if best is None else self._customers[best]["name"]
+
+    def touch(self, name):
+        """Record that ``name`` was just used: update the indexes and append to the log.
+
+        Placeholder and blank names are ignored. A failed write is logged;
+        the customer stays in memory for this session.
+        """
+        used = datetime.now().strftime(TIME_FORMAT)
+        entry = self._record(name, used, picks=1)
+        if entry is None:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"name": entry["name"], "used": used}, ensure_ascii=False) + "\n")
+            self._logged += 1
+        except OSError as e:
+            logging.error(f"Could not save customer {entry['name']} to {self.path}: {e}")
+
+    def _compact(self):
+        """Rewrite the log as one line per picked customer."""
+        picked = [entry for entry in self._customers.values() if entry["picks"]]
+        picked.sort(key=lambda entry: entry["last_used"])
+
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in picked:
+                    record = {"name": entry["name"], "used": entry["last_used"], "picks": entry["picks"]}
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        try:
+            atomic_replace(self.path, write)
+            self._logged = len(picked)
+        except OSError as e:
+            logging.error(f"Could not compact customer log {self.path}: {e}")
@@ -0,0 +1,164 @@
+"""Running end-of-day totals per mode, item and customer.
+
+The save worker folds every invoice it writes into ``DailyTotals`` and
+persists the aggregates to ``Invoice_YYYY-MM-DD.totals.json`` next to the
+day's ledger, so a Z-report is a single small file read instead of a pass
+over the whole day. The totals remember the size of the ledger file they
+cover; when that disagrees with the ledger on disk (a crash between the
+two writes, an edited ledger) they are rebuilt from the raw rows.
+Figures are the engine's integer units (paise, thousandths of a kg or
+packet), so the running sums are exact. Amounts are the Amount cell each
+app saved, not recalculated, so invoices from the Qt app (which keeps its
+own formulas) total what they charged.
+"""
+import json
+import logging
+import os
+
+from invoice_engine import MODE_FIELDS, MONEY_SCALE, QTY_SCALE, calculate_rows, format_fixed, format_money, to_fixed
+from journal import atomic_replace
+from ledger import LEDGER_PREFIX
+
+TOTALS_SUFFIX = ".totals.json"
+UNITS = "paise/thousandths/saved-amounts"  # files written with other units or amount rules are rebuilt
+FIELDS = ["count", "packets", "quantity", "hamali", "amount"]
+
+
+class DailyTotals:
+    """Aggregates for one day, keyed by ``(mode, item, customer)``."""
+
+    def __init__(self, directory, date_str):
+        self.directory = directory
+        self.date_str = date_str
+        self.invoices = 0
+        self.ledger_size = 0  # bytes of the day's ledger these totals cover
+        self.lines = {}   # "mode|item|customer" -> {field: value}
+        self.modes = {}   # mode -> {"invoices", "kata_amount", "amount"}
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{LEDGER_PREFIX}{self.date_str}{TOTALS_SUFFIX}")
+
+    @classmethod
+    def load(cls, directory, date_str):
+        """Load the persisted totals for a day (empty if none were saved yet)."""
+        totals = cls(directory, date_str)
+        try:
+            with open(totals.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("units") != UNITS:
+                raise ValueError(f"units {data.get('units')!r}")
+            totals.invoices = data.get("invoices", 0)
+            # Files from before the size was recorded get rebuilt once
+            totals.ledger_size = data.get("ledger_size", -1)
+            totals.lines = data.get("lines", {})
+            totals.modes = data.get("modes", {})
+        except FileNotFoundError:
+            pass
+        except (ValueError, AttributeError) as e:
+            logging.error(f"Unreadable totals file {totals.path}, will rebuild: {e}")
+            totals.ledger_size = -1  # never matches the ledger, forcing a rebuild
+        return totals
+
+    def add(self, record):
+        """Fold one saved invoice record into the totals."""
+        mode = record["mode"]
+        customer = record["customer"]
+        kata_amount = to_fixed(record.get("kata_amount", 0), MONEY_SCALE)
+        invoice_amount = kata_amount
+        results = calculate_rows(mode, record["rows"]) if mode in MODE_FIELDS else []
+        amount_column = 1 + len(MODE_FIELDS.get(mode, ()))  # after the item and the mode's fields
+        for row, result in zip(record["rows"], results):
+            # Rows without an Amount cell (pre-ledger workbooks) fall back to the engine
+            amount = to_fixed(row[amount_column], MONEY_SCALE) if len(row) > amount_column else result.amount
+            invoice_amount += amount
+            item = str(row[0]).strip() if row else ""
+            line = self.lines.setdefault(f"{mode}|{item}|{customer}", dict.fromkeys(FIELDS, 0))
+            line["count"] += 1
+            line["packets"] += result.packets
+            line["quantity"] += result.quantity
+            line["hamali"] += result.hamali
+            line["amount"] += amount
+        summary = self.modes.setdefault(mode, {"invoices": 0, "kata_amount": 0, "amount": 0})
+        summary["invoices"] += 1
+        summary["kata_amount"] += kata_amount
+        summary["amount"] += invoice_amount
+        self.invoices += 1
+
+    def save(self):
+        """Persist the totals atomically next to the ledger."""
+        data = {
+            "date": self.date_str,
+            "units": UNITS,
+            "invoices": self.invoices,
+            "ledger_size": self.ledger_size,
+            "lines": self.lines,
+            "modes": self.modes,
+        }
+
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+
+        atomic_replace(self.path, write)
+
+    def rebuild(self, records, ledger_size=0):
+        """Recompute everything from raw invoice records.
+
+        Args:
+            records (list): The day's invoices, as ``DailyLedger.read`` returns them.
+            ledger_size (int): Size of the ledger file they were read from.
+        """
+        self.ledger_size = ledger_size
+        self.invoices = 0
+        self.lines = {}
+        self.modes = {}
+        for record in records:
+            self.add(record)
+
+    def by(self, field, mode=None):
+        """Roll the line totals up by ``"mode"``, ``"item"`` or ``"customer"``.
+
+        Args:
+            field (str): Key part to group on.
+            mode (str): Only include lines of this mode, if given.
+        """
+        position = ["mode", "item", "customer"].index(field)
+        rollup = {}
+        for key, line in self.lines.items():
+            parts = key.split("|", 2)
+            if mode is not None and parts[0] != mode:
+                continue
+            target = rollup.setdefault(parts[position], dict.fromkeys(FIELDS, 0))
+            for f in FIELDS:
+                target[f] += line[f]
+        return rollup
+
+    def z_report_lines(self, width=42):
+        """Format the day's totals for the thermal printer / preview."""
+        lines = [
+            "G.V. Mahant Brothers".center(width),
+            f"Z-Report {self.date_str}".center(width),
+            "-" * width,
+        ]
+        grand_total = 0
+        for mode, summary in self.modes.items():
+            lines.append(f"{mode}: {summary['invoices']} invoice(s)".ljust(width))
+            grand_total += summary["amount"]
+            for item, line in sorted(self.by("item", mode).items()):
+                lines.append(
+                    f"  {item[:12]:<12} {format_fixed(line['packets'], QTY_SCALE, 0):>6} "
+                    f"{format_fixed(line['quantity'], QTY_SCALE, 2):>9} {format_money(line['amount']):>10}"
+                )
+            if summary["kata_amount"]:
+                lines.append(f"  Kata Amount: {format_money(summary['kata_amount'])}")
+            lines.append(f"  {mode} Total: ₹{format_money(summary['amount'])}".rjust(width))
+            lines.append("-" * width)
+        lines.extend([
+            f"Invoices: {self.invoices}".ljust(width),
+            f"Grand Total: ₹{format_money(grand_total)}".center(width),
+            "-" * width,
+            "\n",  # Extra line for paper feed
+        ])
+        lines.append(chr(27) + chr(105))  # Full cut, same as the invoice slip
+        return lines
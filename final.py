@@ -1,14 +1,26 @@
+from startup import StartupProfile, prewarm
+
+# Created before the other imports so that their cost is the first phase reported
+STARTUP = StartupProfile()
+
 import customtkinter as ctk
 from tkinter import messagebox, ttk, Toplevel, Text, Scrollbar
 from datetime import datetime
 import os
 import logging
-from openpyxl import Workbook, load_workbook
 import json
-import win32print
-import win32api
-from win32printing import Printer
 import codecs
+import queue
+from invoice_engine import MODES, MONEY_SCALE, format_money, to_fixed
+from invoice_numbers import InvoiceNumberAllocator
+from item_master import ItemMaster
+from ledger import today_str
+from persistence import InvoiceSnapshot, SaveWorker
+from recalc_scheduler import RecalcScheduler
+from row_model import RowModel
+from virtual_grid import VirtualGrid
+
+STARTUP.mark("imports")
 
 # Configure logging
 logging.basicConfig(
@@ -19,15 +31,30 @@ logging.basicConfig(
 # Constants
 CONFIG_FILE = "app_config.json"
 AUTOSAVE_INTERVAL = 300000  # 5 minutes in milliseconds
+SAVE_POLL_INTERVAL = 200  # ms between checks for background save results
+CLOSE_TIMEOUT = 15  # seconds to wait for the save worker when closing
+RECALC_MAX_DELAY = 100  # ms a coalesced recalculation may wait for an idle cycle
+# Only needed at print/export time; imported in the background once the window is up
+PREWARM_MODULES = ("win32print", "openpyxl")
+TABLE_ROW_HEIGHT = 44  # px per table row: 38 px widgets plus 3 px padding above and below
+
+# Per-mode table state, swapped in and out of the app's attributes on a mode switch
+MODE_TABLE_ATTRS = (
+    "table_holder", "table_frame", "table_grid", "_current_headers",
+    "rows", "rows_by_id", "_rows_total", "invoice_number",
+)
 
 # Item list for dropdown
 ITEM_LIST = [
     "MAIZE", "SOYABEAN", "LOBHA", "HULLI", "KADLI", "BLACK MOONG", 
     "CHAMAKI MOONG", "RAGI", "WHEAT", "RICE", "BILAJOLA", "BIJAPUR", 
     "CHS-5", "FEEDS", "KUSUBI", "SASAVI", "SAVI", "CASTER SEEDS", 
-    "TOOR RED", "TOOR WHITE", "HUNASIBIKA", "SF", "AWARI",
-    "Add New Item..."  # Add this as the last option
+    "TOOR RED", "TOOR WHITE", "HUNASIBIKA", "SF", "AWARI"
 ]
+# Starting items for a new item master; ADD_ITEM_OPTION is always the last dropdown entry
+ADD_ITEM_OPTION = "Add New Item..."
+# Row fields an item's defaults fill in when it is picked and they are still empty
+ITEM_DEFAULT_FIELDS = {"less_percent": "less_percent", "hamali": "hamali", "hamali_rate": "hamali"}
 
 def validate_float(value):
     """Validate if a string can be converted to float."""
@@ -58,19 +85,39 @@ ERROR_COLOR = "#f44336"        # Red
 class InvoiceApp(ctk.CTk):
     def __init__(self):
         super().__init__()
+        STARTUP.mark("tk root")
         self.load_config()
+        self.save_worker = SaveWorker(store_path=self.config.get("store_path"))
+        self.save_worker.start()
+        self.invoice_numbers = InvoiceNumberAllocator(self.config.get("store_path"))
+        self.invoice_numbers.prefetch()
+        # One item list for every dropdown, persisted across restarts
+        self.item_master = ItemMaster(self.config.get("item_master_path"), ITEM_LIST)
+        # Bursts of keystrokes become one recalculation per idle cycle
+        self.recalc = RecalcScheduler(self, self._run_recalc, self.config["recalc_max_delay"])
+        STARTUP.mark("config and storage")
         self.setup_ui()
+        STARTUP.mark("build ui")
+        self.after_idle(self._on_first_idle)
+        self.after(SAVE_POLL_INTERVAL, self.poll_save_status)
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
         # Removed the call to self.schedule_autosave() since it's not defined
         # Uncomment the next line if you plan to use autosave later
         # self.schedule_autosave()
-        self._update_timer = None  # Add this line for debouncing
+
+    def _on_first_idle(self):
+        """The window is drawn: report startup time and warm up the print/export imports."""
+        STARTUP.mark("first idle")
+        STARTUP.report()
+        prewarm(PREWARM_MODULES, STARTUP)
 
     def load_config(self):
         """Load application configuration from file"""
         self.config = {
             "theme": "Green",
             "window_size": "1200x800",
-            "autosave": True
+            "autosave": True,
+            "recalc_max_delay": RECALC_MAX_DELAY
         }
         try:
             if os.path.exists(CONFIG_FILE):
@@ -101,8 +148,13 @@ class InvoiceApp(ctk.CTk):
         self.after(100, lambda: self.state('zoomed'))
 
         self.current_mode = ctk.StringVar(value="Patti")
+        # Each mode's table is built on first use and then kept, hidden, with its draft
+        self.mode_tables = {}
+        self._shown_mode = None
         self.rows = []
+        self.rows_by_id = {}  # stable row ID -> row data, for O(1) lookups
         self.row_counter = 0
+        self._rows_total = 0  # Sum of the row models' amounts, in paise
         self.autosave_var = ctk.BooleanVar(value=self.config["autosave"])
 
         # Create tooltip label with improved styling
@@ -116,7 +168,10 @@ class InvoiceApp(ctk.CTk):
         )
         self.tooltip_timer = None
 
+        self.kata_label = None
         self.kata_amount_entry = None
+        # Number of the invoice on screen; taken on its first save
+        self.invoice_number = None
 
         self.build_ui()
 
@@ -204,24 +259,11 @@ class InvoiceApp(ctk.CTk):
         )
         self.customer_entry.pack(side="left")
 
-        # Create a container for the table with scrolling
-        table_container = ctk.CTkFrame(main_frame, fg_color="transparent")
-        table_container.pack(fill="both", expand=True, padx=20, pady=(20, 10))
-
-        # Create a scrollable frame with automatic scrollbar
-        self.scrollable_frame = ctk.CTkScrollableFrame(
-            table_container,
-            fg_color=FRAME_COLOR,
-            corner_radius=10,
-            border_width=1,
-            border_color=BORDER_COLOR,
-            scrollbar_button_color=PRIMARY_COLOR,
-            scrollbar_button_hover_color=SECONDARY_COLOR
-        )
-        self.scrollable_frame.pack(fill="both", expand=True)
-
-        # Set the table frame to the scrollable frame
-        self.table_frame = self.scrollable_frame
+        # Container for the mode tables; they share one cell and the shown one is raised
+        self.table_container = ctk.CTkFrame(main_frame, fg_color="transparent")
+        self.table_container.pack(fill="both", expand=True, padx=20, pady=(20, 10))
+        self.table_container.grid_rowconfigure(0, weight=1)
+        self.table_container.grid_columnconfigure(0, weight=1)
 
         # Bottom frame with improved styling
         self.bottom_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
@@ -271,6 +313,20 @@ class InvoiceApp(ctk.CTk):
             **button_style
         ).pack(side="left", padx=5)
 
+        ctk.CTkButton(
+            left_buttons_frame,
+            text="Export",
+            command=self.export_excel,
+            **button_style
+        ).pack(side="left", padx=5)
+
+        ctk.CTkButton(
+            left_buttons_frame,
+            text="Z-Report",
+            command=self.request_z_report,
+            **button_style
+        ).pack(side="left", padx=5)
+
         # Total section with improved styling
         right_total_frame = ctk.CTkFrame(self.bottom_frame, fg_color="transparent")
         right_total_frame.pack(side="right")
@@ -286,9 +342,15 @@ class InvoiceApp(ctk.CTk):
         )
         self.total_label.pack(side="left")
 
+        self.save_status_label = ctk.CTkLabel(
+            self.bottom_frame,
+            text="",
+            font=LABEL_FONT,
+            text_color=TEXT_COLOR
+        )
+        self.save_status_label.pack(side="left", padx=10)
+
         # Create initial table content
-        self.create_table_headers()
-        self.add_row()
         self.switch_mode()
 
         # Bind the canvas to update its width when the window is resized
@@ -307,18 +369,9 @@ class InvoiceApp(ctk.CTk):
             self.table_frame.configure(width=event.width - 100)
 
     def create_table_headers(self):
-        # Remove existing widgets
-        for widget in self.table_frame.winfo_children():
-            widget.destroy()
-
-        headers = []
-        mode = self.current_mode.get()
-        if mode == "Patti":
-            headers = ["Item", "Packet", "Quantity", "Rate", "Hamali", "Amount"]
-        elif mode == "Kata":
-            headers = ["Item", "Net Wt", "Less%", "Rate", "Hamali Rate", "Amount"]
-        elif mode == "Barthe":
-            headers = ["Item", "Packet", "Weight", "+/-", "Rate", "Hamali", "Amount"]
+        """Header row of the current mode's table (built once per mode)."""
+        mode = MODES.get(self.current_mode.get())
+        headers = list(mode.headers) if mode else []
 
         self._current_headers = headers
 
@@ -340,84 +393,118 @@ class InvoiceApp(ctk.CTk):
         # Add empty space for delete column (no header)
         self.table_frame.grid_columnconfigure(len(headers), weight=0)
 
-    def switch_mode(self):
-        # --- Clear Kata field if it exists ---
-        for widget in self.kata_field_frame.winfo_children():
-            widget.destroy()
-        self.kata_amount_entry = None # Reset the variable
-        # --- End Clear Kata field ---
+    def _create_mode_table(self, mode):
+        """Build the current mode's table: frame, scrollbar, headers and a first row."""
+        self.table_holder = ctk.CTkFrame(self.table_container, fg_color="transparent")
+        self.table_holder.grid(row=0, column=0, sticky="nsew")
+
+        # The table only has widgets for the rows in view; the grid rebinds them on scroll
+        table_scrollbar = ctk.CTkScrollbar(
+            self.table_holder,
+            button_color=PRIMARY_COLOR,
+            button_hover_color=SECONDARY_COLOR
+        )
+        table_scrollbar.pack(side="right", fill="y")
 
-        # Recreate headers which also clears the table frame's rows
+        self.table_frame = table_frame = ctk.CTkFrame(
+            self.table_holder,
+            fg_color=FRAME_COLOR,
+            corner_radius=10,
+            border_width=1,
+            border_color=BORDER_COLOR
+        )
+        self.table_frame.pack(side="left", fill="both", expand=True)
+        self.rows = []
+        self.rows_by_id = {}
+        self._rows_total = 0
+        self.invoice_number = None
+        self.table_grid = VirtualGrid(
+            self.table_frame,
+            table_scrollbar,
+            lambda slot, grid_row: self._build_row_slot(slot, grid_row, mode, table_frame),
+            self._bind_row_slot,
+            TABLE_ROW_HEIGHT
+        )
+        self.table_grid.set_rows(self.rows)
         self.create_table_headers()
-        # Clear the logical rows list
-        self.rows.clear() 
-        self.add_row() # Add a new blank row for the new mode
-
-        # --- Add Kata field if mode is Kata ---
-        if self.current_mode.get() == "Kata":
-            kata_label = ctk.CTkLabel(self.kata_field_frame, text="Kata:", font=LABEL_FONT)
-            kata_label.pack(side="left", padx=(0, 5))
-            
-            self.kata_amount_entry = ctk.CTkEntry(
-                self.kata_field_frame, 
-                font=ENTRY_FONT,
-                height=38,
-                width=120
-            )
-            self.kata_amount_entry.pack(side="left")
-            # Add default value '0'
-            self.kata_amount_entry.insert(0, "0") 
-            # Bind update on key release
-            self.kata_amount_entry.bind("<KeyRelease>", self.update_amounts)
-        # --- End Add Kata field ---
+        self.add_row()
 
-        self.update_amounts() # Recalculate total
+    def switch_mode(self):
+        """Show the current mode's table; the other modes keep their drafts, hidden."""
+        # Pending edits belong to the table being left
+        self.recalc.flush()
+        if self._shown_mode is not None:
+            self.mode_tables[self._shown_mode] = {attr: getattr(self, attr) for attr in MODE_TABLE_ATTRS}
 
-    def add_row(self):
         mode = self.current_mode.get()
-        if mode == "Patti":
-            num_entry_fields = 5
-        elif mode == "Kata":
-            num_entry_fields = 5
-        elif mode == "Barthe":
-            num_entry_fields = 6
+        if mode in self.mode_tables:
+            for attr, value in self.mode_tables[mode].items():
+                setattr(self, attr, value)
         else:
-            num_entry_fields = 5
+            self._create_mode_table(mode)
+        self.table_holder.tkraise()
+        self._shown_mode = mode
+
+        # --- Show the Kata field only in Kata mode (built once, then shown/hidden) ---
+        if mode == "Kata":
+            if self.kata_amount_entry is None:
+                self.kata_label = ctk.CTkLabel(self.kata_field_frame, text="Kata:", font=LABEL_FONT)
+                self.kata_label.pack(side="left", padx=(0, 5))
+
+                self.kata_amount_entry = ctk.CTkEntry(
+                    self.kata_field_frame, 
+                    font=ENTRY_FONT,
+                    height=38,
+                    width=120
+                )
+                self.kata_amount_entry.pack(side="left")
+                # Add default value '0'
+                self.kata_amount_entry.insert(0, "0") 
+                # Bind update on key release; the rows are unchanged, only the total moves
+                self.kata_amount_entry.bind("<KeyRelease>", lambda e: self._show_total())
+            else:
+                # The Kata amount typed earlier is still there
+                self.kata_label.pack(side="left", padx=(0, 5))
+                self.kata_amount_entry.pack(side="left")
+        elif self.kata_amount_entry is not None:
+            self.kata_label.pack_forget()
+            self.kata_amount_entry.pack_forget()
+        # --- End Kata field ---
 
-        entries = []
-        row_idx = len(self.rows) + 1
+        # The table's cached row total is still valid; only the Kata part may change
+        self._show_total()
+
+    def add_row(self):
+        # IDs are never reused, so a stale delete can't hit another row
+        self.row_counter += 1
+        # The model holds the row's values; widgets are only lent to it while it is in view
+        row_data = {"row_id": self.row_counter, "model": RowModel(self.current_mode.get())}
+        self.rows.append(row_data)
+        self.rows_by_id[row_data["row_id"]] = row_data
+        self.table_grid.show(len(self.rows) - 1)
+
+    def _build_row_slot(self, slot, grid_row, mode, table_frame):
+        """Build one pooled row of ``mode``'s table on ``grid_row``.
+
+        Events go to whichever row the slot shows at the time.
+        """
+        # The mode's input fields, after Item
+        num_fields = len(MODES[mode].field_names) if mode in MODES else 4
 
         # Item dropdown with improved styling
+        # Typing a code or the start of a name picks the item; the list is filled when opened
         item_dropdown = ttk.Combobox(
-            self.table_frame,
-            values=ITEM_LIST,
+            table_frame,
             font=("Segoe UI", 15),  # Increased from default 13 to 15 (15% increase)
-            state="readonly"
+            postcommand=lambda: self._fill_item_values(item_dropdown)
         )
-        item_dropdown.grid(row=row_idx, column=0, padx=3, pady=3, sticky="nsew")
-        item_dropdown.bind("<<ComboboxSelected>>", lambda e: self.handle_item_selection(e, item_dropdown))
-        self.table_frame.grid_columnconfigure(0, weight=1)
-        entries.append(item_dropdown)
-
-        # Entry fields with improved styling
-        for i in range(1, num_entry_fields):
-            entry = ctk.CTkEntry(
-                self.table_frame,
-                font=("Segoe UI", 15),  # Increased from default 13 to 15 (15% increase)
-                justify="center",
-                height=38,
-                corner_radius=8,
-                border_color=BORDER_COLOR,
-                fg_color="#ffffff"
-            )
-            entry.grid(row=row_idx, column=i, padx=3, pady=3, sticky="nsew")
-            entry.bind("<KeyRelease>", self.update_amounts)
-            self.table_frame.grid_columnconfigure(i, weight=1)
-            entries.append(entry)
+        item_dropdown.bind("<<ComboboxSelected>>", lambda e: self.handle_item_selection(e, item_dropdown, slot.row))
+        item_dropdown.bind("<KeyRelease>", lambda e: self.on_item_typed(e, item_dropdown, slot.row))
+        item_dropdown.bind("<FocusOut>", lambda e: self.commit_typed_item(e, item_dropdown, slot.row))
 
         # Amount label with improved styling
         amount_label = ctk.CTkLabel(
-            self.table_frame,
+            table_frame,
             text="₹0.00",
             font=("Segoe UI", 15),  # Increased from default 13 to 15 (15% increase)
             anchor="e",
@@ -426,84 +513,187 @@ class InvoiceApp(ctk.CTk):
             fg_color="#ffffff",
             text_color=TEXT_COLOR
         )
-        amount_label.grid(row=row_idx, column=num_entry_fields, padx=3, pady=3, sticky="nsew")
-        self.table_frame.grid_columnconfigure(num_entry_fields, weight=1)
-        entries.append(amount_label)
 
         # Add delete button
         delete_btn = ctk.CTkButton(
-            self.table_frame,
+            table_frame,
             text="X",
             width=40,
             height=38,
             fg_color=ERROR_COLOR,
             hover_color="#d32f2f",
             corner_radius=8,
-            command=lambda: self.delete_row(row_idx)
+            command=lambda: self.delete_row(slot.row["row_id"])
         )
-        delete_btn.grid(row=row_idx, column=num_entry_fields + 1, padx=3, pady=3)
-        entries.append(delete_btn)
 
-        self.rows.append({"row_index": row_idx, "widgets": entries})
+        # Entry fields with improved styling
+        entries = []
+        while len(entries) < num_fields:
+            entry = ctk.CTkEntry(
+                table_frame,
+                font=("Segoe UI", 15),  # Increased from default 13 to 15 (15% increase)
+                justify="center",
+                height=38,
+                corner_radius=8,
+                border_color=BORDER_COLOR,
+                fg_color="#ffffff"
+            )
+            entry.bind("<KeyRelease>", lambda e, i=len(entries), ent=entry: self.on_cell_edit(slot.row, i, ent))
+            entries.append(entry)
+
+        item_dropdown.grid(row=grid_row, column=0, padx=3, pady=3, sticky="nsew")
+        for i, entry in enumerate(entries, 1):
+            entry.grid(row=grid_row, column=i, padx=3, pady=3, sticky="nsew")
+        amount_label.grid(row=grid_row, column=num_fields + 1, padx=3, pady=3, sticky="nsew")
+        delete_btn.grid(row=grid_row, column=num_fields + 2, padx=3, pady=3)
+        for column in range(num_fields + 2):
+            table_frame.grid_columnconfigure(column, weight=1)
+
+        slot.widgets = [item_dropdown] + entries + [amount_label, delete_btn]
+
+    def _bind_row_slot(self, slot, row_data):
+        """Show a row's model in a pooled row of widgets."""
+        model = row_data["model"]
+        widgets = slot.widgets
+        widgets[0].set(model.item)
+        for entry, text in zip(widgets[1:-2], model.texts):
+            # Leave the entry alone while it already shows the text (keeps the cursor)
+            if entry.get() != text:
+                entry.delete(0, 'end')
+                entry.insert(0, text)
+        widgets[-2].configure(text=f"₹{format_money(model.amount)}")
+
+    def _fill_item_values(self, dropdown):
+        """Give a dropdown the item list as it opens: matches for typed text, else everything."""
+        text = dropdown.get()
+        if text and text not in self.item_master:
+            names = self.item_master.search(text)
+        else:
+            names = self.item_master.names
+        dropdown["values"] = names + [ADD_ITEM_OPTION]
 
-    def handle_item_selection(self, event, dropdown):
+    def handle_item_selection(self, event, dropdown, row_data):
         """Handle item selection from dropdown, including the 'Add New Item' option."""
         selected_item = dropdown.get()
-        if selected_item == "Add New Item...":
-            # Create a dialog for adding new item
-            dialog = ctk.CTkInputDialog(
-                text="Enter new item name:",
-                title="Add New Item"
-            )
-            new_item = dialog.get_input()
-            
+        if selected_item == ADD_ITEM_OPTION:
+            new_item = self.ask_new_item()
             if new_item:
-                new_item = new_item.strip().upper()
-                if new_item and new_item not in ITEM_LIST[:-1]:  # Exclude "Add New Item..." from check
-                    # Add the new item before "Add New Item..."
-                    ITEM_LIST.insert(-1, new_item)
-                    # Update all dropdowns
-                    for row_data in self.rows:
-                        for widget in row_data["widgets"]:
-                            if isinstance(widget, ttk.Combobox):
-                                widget["values"] = ITEM_LIST
-                    messagebox.showinfo("Success", f"Item '{new_item}' added successfully!")
-                elif new_item in ITEM_LIST[:-1]:
-                    messagebox.showwarning("Warning", "This item already exists!")
-                else:
-                    messagebox.showwarning("Warning", "Please enter a valid item name!")
+                try:
+                    # Saved to the item master; every dropdown sees it the next time it opens
+                    new_item["name"] = new_item["name"].upper()
+                    item = self.item_master.add(**new_item)
+                    messagebox.showinfo("Success", f"Item '{item['name']}' added successfully! (code {item['code']})")
+                except ValueError as e:
+                    messagebox.showwarning("Warning", str(e))
             # Reset the dropdown to empty
             dropdown.set("")
+            row_data["model"].item = ""
         else:
-            # Normal item selection, update amounts
-            self.update_amounts(event)
-
-    def delete_row(self, row_idx):
-        """Delete a specific row from the table."""
+            self._set_row_item(row_data, dropdown, self.item_master.get(selected_item), selected_item)
+
+    def ask_new_item(self):
+        """Ask for a new item's name, code, Kannada name and default Less%/hamali.
+
+        Returns:
+            dict: ``ItemMaster.add`` keyword arguments, or None if cancelled
+            or no name was given.
+        """
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Add New Item")
+        dialog.transient(self)
+        dialog.grab_set()
+        labels = {
+            "name": "Item name:",
+            "code": "Code (blank for next number):",
+            "kannada": "Kannada name:",
+            "less_percent": "Default Less %:",
+            "hamali": "Default hamali:",
+        }
+        entries = {}
+        for row, (field, label) in enumerate(labels.items()):
+            ctk.CTkLabel(dialog, text=label).grid(row=row, column=0, padx=10, pady=5, sticky="w")
+            entries[field] = ctk.CTkEntry(dialog, width=220)
+            entries[field].grid(row=row, column=1, padx=10, pady=5)
+        result = {}
+
+        def submit(event=None):
+            result.update({field: entry.get().strip() for field, entry in entries.items()})
+            dialog.destroy()
+
+        buttons = ctk.CTkFrame(dialog, fg_color="transparent")
+        buttons.grid(row=len(labels), column=0, columnspan=2, pady=10)
+        ctk.CTkButton(buttons, text="Add", width=100, command=submit).pack(side="left", padx=5)
+        ctk.CTkButton(buttons, text="Cancel", width=100, command=dialog.destroy).pack(side="left", padx=5)
+        dialog.bind("<Return>", submit)
+        dialog.bind("<Escape>", lambda event: dialog.destroy())
+        entries["name"].focus_set()
+        self.wait_window(dialog)
+        return result if result.get("name") else None
+
+    def on_item_typed(self, event, dropdown, row_data):
+        """Keep the row's item in step with the typed text; Enter resolves it."""
+        if event.keysym == "Return":
+            self.commit_typed_item(event, dropdown, row_data)
+        elif row_data is not None:
+            row_data["model"].item = dropdown.get().strip()
+
+    def commit_typed_item(self, event, dropdown, row_data):
+        """Turn a typed code or unique prefix into the item's name.
+
+        Unknown text is kept as typed; on Enter an ambiguous prefix opens
+        the dropdown with just the matching items.
+        """
+        if row_data is None:
+            return
+        text = dropdown.get().strip()
+        item = self.item_master.resolve(text)
+        if item is None:
+            row_data["model"].item = text
+            if event.keysym == "Return" and self.item_master.search(text):
+                dropdown.event_generate("<Down>")
+            return
+        self._set_row_item(row_data, dropdown, item, item["name"])
+
+    def _set_row_item(self, row_data, dropdown, item, name):
+        """Put ``name`` on the row and fill empty fields from the item's defaults."""
+        dropdown.set(name)
+        model = row_data["model"]
+        model.item = name
+        if item is None:
+            return
+        filled = False
+        for index, field in enumerate(MODES[model.mode].field_names):
+            default = item.get(ITEM_DEFAULT_FIELDS.get(field, ""), "")
+            if default and not model.texts[index]:
+                if model.set_text(index, default):
+                    self.recalc.request(row_data)
+                filled = True
+        if filled:
+            self.table_grid.refresh(row_data)
+
+    def delete_row(self, row_id):
+        """Delete the row with the given stable ID from the table."""
         try:
             # Don't allow deletion if only one row remains
             if len(self.rows) <= 1:
                 messagebox.showwarning("Warning", "Cannot delete the last row.")
                 return
 
-            # Find and remove the row
-            for i, row_data in enumerate(self.rows):
-                if row_data["row_index"] == row_idx:
-                    # Destroy all widgets in the row
-                    for widget in row_data["widgets"]:
-                        widget.destroy()
-                    # Remove the row from our list
-                    self.rows.pop(i)
-                    break
-
-            # Reindex remaining rows
-            for i, row_data in enumerate(self.rows, 1):
-                row_data["row_index"] = i
-                for j, widget in enumerate(row_data["widgets"]):
-                    widget.grid(row=i, column=j)
-
-            # Update amounts after deletion
-            self.update_amounts()
+            row_data = self.rows_by_id.pop(row_id, None)
+            if row_data is None:
+                return  # Already deleted (e.g. a double click on X)
+
+            # Remove the row from our list and its amount from the total; a row
+            # on screen (the X was clicked) is found through its slot, not a search
+            del self.rows[self.table_grid.index_of(row_data)]
+            self.recalc.discard(row_data)
+            self._rows_total -= row_data["model"].amount
+
+            # Only the slots from the deleted row down are rebound to the rows that moved up
+            self.table_grid.render()
+
+            # Update the total after deletion
+            self._show_total()
 
             # Force update the UI
             self.update_idletasks()
@@ -516,19 +706,14 @@ class InvoiceApp(ctk.CTk):
         """Clear all rows except one."""
         try:
             # Keep only the first row
-            while len(self.rows) > 1:
-                row_data = self.rows[-1]
-                for widget in row_data["widgets"]:
-                    widget.destroy()
-                self.rows.pop()
+            del self.rows[1:]
+            self.rows_by_id = {self.rows[0]["row_id"]: self.rows[0]}
+
+            self.invoice_number = None  # Next save starts a new invoice
 
             # Reset the first row
-            first_row = self.rows[0]
-            for widget in first_row["widgets"]:
-                if isinstance(widget, (ctk.CTkEntry, ttk.Combobox)):
-                    widget.delete(0, 'end')
-                elif isinstance(widget, ctk.CTkLabel):
-                    widget.configure(text="₹0.00")
+            self.rows[0]["model"].clear()
+            self.table_grid.render(rebind=True)
 
             # Update amounts
             self.update_amounts()
@@ -541,109 +726,100 @@ class InvoiceApp(ctk.CTk):
             messagebox.showerror("Error", "Failed to clear rows. Please try again.")
 
     def update_amounts(self, event=None):
-        """Update all amount calculations in real time (no debounce)."""
-        self._do_update_amounts()
+        """Schedule a recalculation of every row and the total (mode switches, clears, loads)."""
+        self.recalc.request()
+
+    def _run_recalc(self, rows):
+        """Scheduler callback: recalculate the rows edited since the last run, or all of them."""
+        if rows is None:
+            self._do_update_amounts()
+        else:
+            for row_data in rows:
+                self.update_row_amount(row_data)
+
+    def on_cell_edit(self, row_data, index, entry):
+        """Parse the edited cell into the row model and schedule that row."""
+        if row_data["model"].set_text(index, entry.get()):
+            self.recalc.request(row_data)
+
+    def _calculate_row_amount(self, row_data):
+        """Recalculate a row's model and show the amount if the row is in view."""
+        model = row_data["model"]
+        try:
+            model.recalculate()
+            self._show_row_amount(row_data)
+        except Exception as e:
+            logging.error(f"Error calculating amount: {e}")
+            self._show_row_amount(row_data, "₹Error") # Indicate error on the row
+        return model.amount
+
+    def _show_row_amount(self, row_data, text=None):
+        """Update the amount label of a row, if one is bound to it right now."""
+        slot = self.table_grid.slot_for(row_data)
+        if slot is not None:
+            # The amount label is always the second-to-last widget (before delete button)
+            slot.widgets[-2].configure(text=text or f"₹{format_money(row_data['model'].amount)}")
+
+    def update_row_amount(self, row_data):
+        """Recalculate only the edited row and move the total by its change."""
+        model = row_data["model"]
+        delta = model.recalculate()
+        if delta:
+            self._show_row_amount(row_data)
+            self._rows_total += delta
+            self._show_total()
 
     def _do_update_amounts(self):
         """Actually perform the amount updates."""
         try:
             logging.debug("Updating amounts for all rows")
-            total = 0.0
-            mode = self.current_mode.get()
-
+            total = 0
             # Calculate sum of row amounts
             for row_data in self.rows:
-                widgets = row_data["widgets"]
-                amount = 0.0 # Default amount
-                try:
-                    if mode == "Patti":
-                        # Item [0], Pkt [1], Qty [2], Rate [3], Hamali [4], AmountLabel [5]
-                        if len(widgets) > 4:
-                            qty = validate_float(widgets[2].get())
-                            rate = validate_float(widgets[3].get())
-                            pkt = validate_float(widgets[1].get())
-                            hamali = validate_float(widgets[4].get())
-                            amount = (qty * rate) + (pkt * hamali)
-                    elif mode == "Kata":
-                        # Item [0], Net [1], Less% [2], Rate [3], HamaliRate [4], AmountLabel [5]
-                         if len(widgets) > 4:
-                            net = validate_float(widgets[1].get())
-                            less = validate_float(widgets[2].get())
-                            final_wt = net * (1 - less / 100.0) if less < 100 else 0.0
-                            rate = validate_float(widgets[3].get())
-                            hamali_rate = validate_float(widgets[4].get())
-                            # Calculate packets based on net weight (e.g., if 60kg/packet)
-                            # This logic might need adjustment based on actual use case
-                            packets = int(net / 60) if net > 0 else 0 
-                            amount = (final_wt * rate) + (packets * hamali_rate)
-                    elif mode == "Barthe":
-                        # Item [0], Pkt [1], Wt/Pkt [2], +/- Adj [3], Rate [4], Hamali/Pkt [5], AmountLabel [6]
-                         if len(widgets) > 5:
-                            pkt = validate_float(widgets[1].get())
-                            wt_per_pkt = validate_float(widgets[2].get())
-                            adj = validate_float(widgets[3].get()) # Adjustment weight
-                            rate = validate_float(widgets[4].get()) # Rate per kg
-                            hamali_per_pkt = validate_float(widgets[5].get())
-                            total_qty = (pkt * wt_per_pkt) + adj
-                            amount = (total_qty * rate) + (pkt * hamali_per_pkt)
-                    
-                    # Update the amount label for the current row
-                    # The amount label is always the second-to-last widget (before delete button)
-                    if len(widgets) > 0:
-                        widgets[-2].configure(text=f"₹{amount:.2f}")
-                    total += amount
-
-                except IndexError:
-                     logging.error(f"Index error calculating amount for row. Widgets: {len(widgets)}")
-                except Exception as e:
-                    logging.error(f"Error calculating amount: {e}")
-                    if len(widgets) > 0:
-                         widgets[-2].configure(text="₹Error") # Indicate error on the row
-
-            # --- Add Kata Amount if applicable ---
-            kata_amount = 0.0
-            if mode == "Kata" and self.kata_amount_entry:
-                try:
-                    kata_amount = validate_float(self.kata_amount_entry.get())
-                    # Add visual feedback for invalid input (optional)
-                    if self.kata_amount_entry.get().strip() and kata_amount == 0 and self.kata_amount_entry.get() != '0':
-                         self.kata_amount_entry.configure(fg_color="pink")
-                    else:
-                         # Reset color on valid input
-                         self.kata_amount_entry.configure(fg_color=ctk.ThemeManager.theme["CTkEntry"]["fg_color"]) 
-                except Exception as e:
-                    logging.error(f"Error reading Kata amount: {e}")
-                    # Maybe provide visual feedback on error
-                    self.kata_amount_entry.configure(fg_color="pink")
-            
-            total += kata_amount # Add validated Kata amount to total
-            # --- End Add Kata Amount ---
-
-            self.total_label.configure(text=f"Total Amount: ₹{total:.2f}")
+                total += self._calculate_row_amount(row_data)
+            self._rows_total = total
+            self._show_total()
 
         except Exception as e:
             error_msg = f"Error updating amounts: {str(e)}"
             logging.error(error_msg)
             self.total_label.configure(text="₹Error")
 
+    def _show_total(self):
+        """Show the cached row total plus the Kata amount."""
+        total = self._rows_total
+
+        # --- Add Kata Amount if applicable ---
+        kata_amount = 0
+        if self.current_mode.get() == "Kata" and self.kata_amount_entry:
+            try:
+                kata_amount = to_fixed(self.kata_amount_entry.get(), MONEY_SCALE)
+                # Add visual feedback for invalid input (optional)
+                if self.kata_amount_entry.get().strip() and kata_amount == 0 and self.kata_amount_entry.get() != '0':
+                     self.kata_amount_entry.configure(fg_color="pink")
+                else:
+                     # Reset color on valid input
+                     self.kata_amount_entry.configure(fg_color=ctk.ThemeManager.theme["CTkEntry"]["fg_color"]) 
+            except Exception as e:
+                logging.error(f"Error reading Kata amount: {e}")
+                # Maybe provide visual feedback on error
+                self.kata_amount_entry.configure(fg_color="pink")
+        
+        total += kata_amount # Add validated Kata amount to total
+        # --- End Add Kata Amount ---
+
+        self.total_label.configure(text=f"Total Amount: ₹{format_money(total)}")
+
     def save_to_excel(self, show_popup=True):
+        """Queue the current invoice for the background writer.
+
+        The store and the daily ledger are written on the save worker's
+        thread; this returns as soon as the snapshot is queued and the
+        outcome shows up in the save status label.
+        """
         try:
-            # Get user's home directory
-            home_dir = os.path.expanduser("~") 
-            # Create the full path to the Documents folder
-            documents_path = os.path.join(home_dir, "Documents")
-            
-            # Ensure the Documents directory exists, create if not
-            os.makedirs(documents_path, exist_ok=True) 
-            
-            # Create the filename based on the current date
-            date_str = datetime.now().strftime('%Y-%m-%d')
-            base_filename = f"Invoice_{date_str}.xlsx"
-            
-            # Combine documents path and filename
-            full_save_path = os.path.join(documents_path, base_filename)
-            
-            logging.info(f"Target save path: {full_save_path}")
+            # Amount labels are read below, so apply any pending recalculation first
+            self.recalc.flush()
 
             # Get Invoice Data
             customer = self.customer_entry.get().strip() or "Unknown Customer"
@@ -651,77 +827,48 @@ class InvoiceApp(ctk.CTk):
             
             headers = getattr(self, '_current_headers', []) 
             if not headers:
-                if mode == "Patti":
-                    headers = ["Item", "Packet", "Quantity", "Rate", "Hamali", "Amount"]
-                elif mode == "Kata":
-                    headers = ["Item", "Net Wt", "Less%", "Rate", "Hamali Rate", "Amount"]
-                elif mode == "Barthe":
-                    headers = ["Item", "Packet", "Weight", "+/-", "Rate", "Hamali", "Amount"]
-                else: 
-                    headers = ["Col1", "Col2", "Col3", "Col4", "Col5", "Col6", "Amount"]
-
-            data_rows = []
-            for row_data in self.rows:
-                widgets = row_data["widgets"]
-                row_values = []
-                for w in widgets:
-                    if isinstance(w, (ctk.CTkEntry, ttk.Combobox)):
-                        row_values.append(w.get())
-                    elif isinstance(w, ctk.CTkLabel):
-                        row_values.append(w.cget("text").replace('₹', '').replace('Error', '0'))
-                    else:
-                        row_values.append("")
-
-                if row_values and row_values[0].strip():
-                    data_rows.append(row_values)
+                headers = list(MODES[mode].headers) if mode in MODES else ["Col1", "Col2", "Col3", "Col4", "Col5", "Col6", "Amount"]
+
+            data_rows = [
+                row_data["model"].as_row() for row_data in self.rows
+                if row_data["model"].item.strip()
+            ]
 
             if not data_rows:
                 if show_popup:
                     messagebox.showwarning("No Data", "No data entered to save.")
                 return
 
-            # Excel Writing Logic with proper workbook handling
-            try:
-                if os.path.exists(full_save_path):
-                    wb = load_workbook(full_save_path)
-                else:
-                    wb = Workbook()
-                    
-                # Check if mode sheet exists, create or get it
-                if mode in wb.sheetnames:
-                    ws = wb[mode]
-                else:
-                    if len(wb.sheetnames) > 0:
-                        # If there are sheets but none match our mode, create new one
-                        ws = wb.create_sheet(title=mode)
-                    else:
-                        # If it's a new workbook, rename the default sheet
-                        ws = wb.active
-                        ws.title = mode
-
-                # Only write headers if the sheet is empty
-                if ws.max_row == 0:
-                    ws.append(["Timestamp", "Customer"] + headers)
-
-                # Write data
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                for row in data_rows:
-                    ws.append([timestamp, customer] + row)
-
-                # Save the workbook
-                wb.save(full_save_path)
-                logging.info(f"Successfully saved invoice data to {full_save_path} (Sheet: {mode})")
-                if show_popup:
-                    messagebox.showinfo("Saved", f"Invoice data saved to:\n{full_save_path}\n(Sheet: {mode})")
+            # Re-saving the same invoice keeps its number, so the writer updates it in place
+            if self.invoice_number is None:
+                try:
+                    self.invoice_number = self.invoice_numbers.next_number()
+                except TimeoutError:
+                    logging.error("No invoice number reserved yet; invoice not queued")
+                    self.save_status_label.configure(text="Waiting for invoice numbers", text_color=ERROR_COLOR)
+                    if show_popup:
+                        messagebox.showerror("Save Error", "Invoice numbers are still being reserved.\nPlease try again in a moment.")
+                    return
+
+            record = {
+                "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "customer": customer,
+                "mode": mode,
+                "headers": headers,
+                "rows": data_rows,
+                "invoice_no": self.invoice_number,
+            }
+            if mode == "Kata" and self.kata_amount_entry:
+                record["kata_amount"] = validate_float(self.kata_amount_entry.get())
 
-            except PermissionError:
-                error_msg = f"Cannot save '{base_filename}'.\nThe file might be open in Excel.\n\nLocation: {documents_path}"
-                logging.error(error_msg)
-                if show_popup:
-                    messagebox.showerror("Permission Error", error_msg)
-            except Exception as e:
-                error_msg = f"Error saving Excel file to:\n{full_save_path}\n\nError: {str(e)}"
-                logging.error(error_msg)
+            # The store is the system of record; the ledger feeds the Excel export
+            try:
+                self.save_worker.submit(InvoiceSnapshot.from_record(record))
+                self.save_status_label.configure(text="Saving...", text_color=TEXT_COLOR)
+            except queue.Full:
+                error_msg = "Saves are still being written to disk.\nPlease try again in a moment."
+                logging.error("Save queue full; invoice not queued")
+                self.save_status_label.configure(text="Save queue full", text_color=ERROR_COLOR)
                 if show_popup:
                     messagebox.showerror("Save Error", error_msg)
 
@@ -731,8 +878,62 @@ class InvoiceApp(ctk.CTk):
             if show_popup:
                 messagebox.showerror("Error", error_msg)
 
+    def export_excel(self):
+        """Queue an export of today's ledger to Invoice_<date>.xlsx."""
+        try:
+            self.save_worker.request_export(today_str())
+            self.save_status_label.configure(text="Exporting...", text_color=TEXT_COLOR)
+        except queue.Full:
+            messagebox.showerror("Export Error", "Saves are still being written to disk.\nPlease try again in a moment.")
+
+    def request_z_report(self):
+        """Ask the writer for today's running totals; shown when they arrive."""
+        try:
+            self.save_worker.request_z_report(today_str())
+        except queue.Full:
+            messagebox.showerror("Z-Report Error", "Saves are still being written to disk.\nPlease try again in a moment.")
+
+    def poll_save_status(self):
+        """Show the outcome of background saves and exports."""
+        for kind, detail in self.save_worker.poll_results():
+            if kind == "saved":
+                self.save_status_label.configure(
+                    text=f"Saved {datetime.now().strftime('%I:%M:%S %p')}",
+                    text_color=TEXT_COLOR
+                )
+            elif kind == "pending":
+                self.save_status_label.configure(
+                    text=f"{detail} pending (file locked, retrying)",
+                    text_color=ERROR_COLOR
+                )
+            elif kind == "exported":
+                if detail:
+                    self.save_status_label.configure(text="Exported to Excel", text_color=TEXT_COLOR)
+                else:
+                    self.save_status_label.configure(text="No invoices saved today", text_color=TEXT_COLOR)
+            elif kind == "z_report":
+                self.show_print_preview(detail, title="Z-Report")
+            else:
+                self.save_status_label.configure(text="Save failed", text_color=ERROR_COLOR)
+                messagebox.showerror("Save Error", detail)
+        self.after(SAVE_POLL_INTERVAL, self.poll_save_status)
+
+    def on_closing(self):
+        """Export the day's workbook and let the writer finish before exiting."""
+        stats = self.recalc.stats()
+        logging.info(f"Recalculations: {stats['requested']} requested, {stats['runs']} run")
+        if self.save_worker.is_alive():
+            try:
+                self.save_worker.request_export(today_str(), block=True, timeout=CLOSE_TIMEOUT)
+            except queue.Full:
+                logging.error("Save worker is busy; skipping the export on exit")
+        if not self.save_worker.stop(timeout=CLOSE_TIMEOUT):
+            logging.error("Save worker did not finish in time; unsaved invoices are replayed on the next start")
+        self.destroy()
+
     def generate_print_content(self):
         """Generates the formatted string list for printing/preview."""
+        self.recalc.flush()
         lines = []
         customer = self.customer_entry.get().strip() or "N/A"
         mode = self.current_mode.get()
@@ -744,28 +945,16 @@ class InvoiceApp(ctk.CTk):
             "G.V. Mahant Brothers".center(max_width),
             datetime.now().strftime("%d-%b-%Y %H:%M").center(max_width),
             "-" * max_width,
+            f"Invoice No: {self.invoice_number or '-'}".ljust(max_width),
             f"Customer: {customer}".ljust(max_width),
             "-" * max_width,
         ])
 
         # --- Column Headers ---
-        # Optimized format strings for better space utilization with 42 chars
-        header_fmt = ""
-        if mode == "Patti":
-            # Item(8) Pkt(4) Qty(5) Rate(7) Ham(4) Amt(6) = 34 + spaces = 42
-            header_fmt = "{:<8} {:>4} {:>5} {:>7} {:>4} {:>6}"
-            headers = ["Item", "Pkt", "Qty", "Rate", "Ham", "Amt"]
-        elif mode == "Kata":
-            # Item(8) Net(4) Les(4) Rate(7) Ham(4) Amt(6) = 33 + spaces = 42
-            header_fmt = "{:<8} {:>4} {:>4} {:>7} {:>4} {:>6}"
-            headers = ["Item", "Net", "Les", "Rate", "Ham", "Amt"]
-        elif mode == "Barthe":
-            # Item(7) Pkt(4) Wt(4) +/-(4) Rate(6) Ham(4) Amt(6) = 35 + spaces = 42
-            header_fmt = "{:<7} {:>4} {:>4} {:>4} {:>6} {:>4} {:>6}"
-            headers = ["Item", "Pkt", "Wt", "+/-", "Rate", "Ham", "Amt"]
-        
-        if header_fmt:
-            lines.append(header_fmt.format(*headers))
+        # Column widths come from the mode spec and fit the 42-char line
+        layout = MODES.get(mode)
+        if layout:
+            lines.append(layout.print_format.format(*layout.print_headers))
         else:
             lines.append("Error: Mode not recognized for printing.")
         
@@ -773,79 +962,33 @@ class InvoiceApp(ctk.CTk):
 
         # --- Data Rows ---
         kata_amount_line = None
-        total = 0.0
+        total = 0  # paise, from the row models
         for row_data in self.rows:
-            widgets = row_data["widgets"]
-            row_values = []
-            for w in widgets:
-                if isinstance(w, (ctk.CTkEntry, ttk.Combobox)):
-                    row_values.append(w.get().strip())
-                elif isinstance(w, ctk.CTkLabel):
-                    text = w.cget("text").replace('₹', '').replace('Error', '0').strip()
-                    row_values.append(text)
-                else: 
-                    row_values.append("")
+            row_values = [value.strip() for value in row_data["model"].as_row()]
 
             if not row_values or not row_values[0]:
                 continue
             
             try:
-                if mode == "Patti" and len(row_values) >= 6:
-                    lines.append(header_fmt.format(
-                        row_values[0][:8],   # Item name up to 8 chars
-                        row_values[1][:4],   # Pkt up to 4 chars
-                        row_values[2][:5],   # Qty up to 5 chars
-                        row_values[3][:7],   # Rate up to 7 chars
-                        row_values[4][:4],   # Hamali up to 4 chars
-                        row_values[5][:6]    # Amount up to 6 chars
-                    ))
-                    try:
-                        total += float(row_values[5])
-                    except Exception:
-                        pass
-                elif mode == "Kata" and len(row_values) >= 6:
-                    lines.append(header_fmt.format(
-                        row_values[0][:8],   # Item name up to 8 chars
-                        row_values[1][:4],   # Net up to 4 chars
-                        row_values[2][:4],   # Less up to 4 chars
-                        row_values[3][:7],   # Rate up to 7 chars
-                        row_values[4][:4],   # Hamali up to 4 chars
-                        row_values[5][:6]    # Amount up to 6 chars
-                    ))
-                    try:
-                        total += float(row_values[5])
-                    except Exception:
-                        pass
-                elif mode == "Barthe" and len(row_values) >= 7:
-                    lines.append(header_fmt.format(
-                        row_values[0][:7],   # Item name up to 7 chars
-                        row_values[1][:4],   # Pkt up to 4 chars
-                        row_values[2][:4],   # Weight up to 4 chars
-                        row_values[3][:4],   # +/- up to 4 chars
-                        row_values[4][:6],   # Rate up to 6 chars
-                        row_values[5][:4],   # Hamali up to 4 chars
-                        row_values[6][:6]    # Amount up to 6 chars
-                    ))
-                    try:
-                        total += float(row_values[6])
-                    except Exception:
-                        pass
+                if layout:
+                    lines.append(layout.print_row(row_values))
+                total += row_data["model"].amount
             except Exception as fmt_e:
                 lines.append(f"Fmt Error: {fmt_e}")
 
         # --- Add Kata Amount if applicable ---
         if mode == "Kata" and self.kata_amount_entry:
             kata_val_str = self.kata_amount_entry.get().strip()
-            kata_amount = validate_float(kata_val_str)
+            kata_amount = to_fixed(kata_val_str, MONEY_SCALE)
             # Place Kata Amount at the far left, below the last data row
-            kata_amount_line = f"Kata Amount: {kata_amount:.2f}"
+            kata_amount_line = f"Kata Amount: {format_money(kata_amount)}"
             lines.append(kata_amount_line.ljust(max_width))
             total += kata_amount
 
         # --- Footer ---
         lines.extend([
             "-" * max_width,
-            f"Total Amount: ₹{total:.2f}".center(max_width),
+            f"Total Amount: ₹{format_money(total)}".center(max_width),
             "-" * max_width,
             "\n"  # Extra line for paper feed
         ])
@@ -855,13 +998,17 @@ class InvoiceApp(ctk.CTk):
 
         return lines
 
-    def save_for_print(self):
-        """Prints the generated content to the default printer."""
+    def save_for_print(self, lines=None):
+        """Prints the generated content (or the given lines) to the default printer."""
+        printer_name = "the default printer"
         try:
+            import win32print  # Windows only; usually prewarmed at startup
+
             printer_name = win32print.GetDefaultPrinter()
             logging.info(f"Attempting to print to default printer: {printer_name}")
             
-            lines = self.generate_print_content()
+            if lines is None:
+                lines = self.generate_print_content()
             print_content = "\n".join(lines)
             
             # First try UTF-8 encoding for Kannada text
@@ -899,14 +1046,20 @@ class InvoiceApp(ctk.CTk):
             messagebox.showerror("Print Error", f"Could not print to {printer_name}.\nCheck if your printer supports Kannada text.\n\nError: {e}")
 
 
-    def show_print_preview(self):
-        """Shows a Toplevel window with a preview of the print output."""
+    def show_print_preview(self, lines=None, title="Print Preview"):
+        """Shows a Toplevel window with a preview of the print output.
+
+        With ``lines`` (e.g. a Z-report) those are previewed and printed
+        instead of the current invoice, which is then not auto-saved.
+        """
         try:
-            # Auto-save before showing preview
-            self.save_to_excel(show_popup=False)
+            if lines is None:
+                # Auto-save before showing preview
+                self.save_to_excel(show_popup=False)
+                lines = self.generate_print_content()
             
             preview = ctk.CTkToplevel(self)
-            preview.title("Print Preview")
+            preview.title(title)
             preview.geometry("450x600") # Slightly wider for better view
             preview.transient(self) # Keep preview on top of main window
             preview.grab_set()  # Make the window modal
@@ -934,8 +1087,6 @@ class InvoiceApp(ctk.CTk):
             )
             preview_text.pack(fill="both", expand=True)
             
-            # Generate print content and display it
-            lines = self.generate_print_content()
             # Join lines, but remove the final cut command for preview
             preview_content = "\n".join(lines[:-1]) if lines else "" 
             
@@ -954,7 +1105,7 @@ class InvoiceApp(ctk.CTk):
                 button_frame,
                 text="Print",
                 # Lambda calls destroy first, then the print function
-                command=lambda: [preview.destroy(), self.save_for_print()], 
+                command=lambda: [preview.destroy(), self.save_for_print(lines)], 
                 width=120
             ).grid(row=0, column=0, padx=5, pady=5, sticky="ew")
 
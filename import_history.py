@@ -0,0 +1,207 @@
+"""Bulk import of historical ``Invoice_*.xlsx`` files into the invoice store.
+
+Every app variant has written its own flavour of the daily workbook: a
+``Timestamp, Customer`` + headers sheet per mode (final.py, the Qt and Tk
+apps), short headers such as ``Pkt``/``Qty``/``Ham``, or gv.py's single
+sheet with ``Date, Customer, Mode`` columns. Each workbook is streamed in
+openpyxl read-only mode on a process pool, normalised into the store's
+``InvoiceItems`` shape and bulk-loaded in one transaction.
+
+Usage:
+    python import_history.py [DIRECTORY] [--db PATH] [--workers N]
+"""
+import argparse
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from invoice_store import ITEM_COLUMNS, MODE_COLUMNS, InvoiceStore, complete_item, parse_cell
+from ledger import default_documents_dir
+
+# Header text (lower-cased) -> InvoiceItems column, across every app variant
+HEADER_ALIASES = {
+    "item": "item",
+    "packet": "packet",
+    "pkt": "packet",
+    "quantity": "quantity",
+    "qty": "quantity",
+    "rate": "rate",
+    "hamali": "hamali",
+    "ham": "hamali",
+    "hamali rate": "hamaliRate",
+    "net wt": "netWeight",
+    "net weight": "netWeight",
+    "net": "netWeight",
+    "less%": "lessPercent",
+    "less %": "lessPercent",
+    "less": "lessPercent",
+    "les": "lessPercent",
+    "weight": "weight",
+    "wt": "weight",
+    "+/-": "adjustment",
+    "amount": "amount",
+    "amt": "amount",
+}
+
+
+# Columns one app's header names and another mode stores under the other name
+COLUMN_VARIANTS = {"hamali": "hamaliRate", "hamaliRate": "hamali"}
+
+
+def column_map(mode, headers):
+    """Map header positions to ``InvoiceItems`` columns for ``mode``.
+
+    A "Ham"/"Hamali" header lands in whichever of ``hamali`` and
+    ``hamaliRate`` the mode stores per ``invoice_store.MODE_COLUMNS``
+    (Kata and Barthe keep a per-unit rate).
+    """
+    columns = MODE_COLUMNS.get(mode, ())
+    mapping = {}
+    for index, header in enumerate(headers):
+        column = HEADER_ALIASES.get(str(header or "").strip().lower())
+        if column not in columns and COLUMN_VARIANTS.get(column) in columns:
+            column = COLUMN_VARIANTS[column]
+        if column and column not in mapping.values():
+            mapping[index] = column
+    return mapping
+
+
+def normalise_row(mode, mapping, values, sl_no):
+    """Build one ``InvoiceItems`` dict from a sheet row, or None if it has no item."""
+    item = dict.fromkeys(ITEM_COLUMNS)
+    item["slNo"] = sl_no
+    for index, column in mapping.items():
+        value = values[index] if index < len(values) else None
+        if column == "item":
+            item["item"] = "" if value is None else str(value).strip()
+        else:
+            item[column] = parse_cell("" if value is None else value)
+    if not item["item"]:
+        return None
+    return complete_item(mode, item)
+
+
+def read_workbook(path):
+    """Read one workbook into normalised invoices (runs in a pool process)."""
+    from openpyxl import load_workbook
+
+    invoices = []
+    wb = load_workbook(path, read_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                continue
+            header = tuple("" if h is None else str(h).strip() for h in header)
+            if header[:3] == ("Date", "Customer", "Mode"):
+                # gv.py: one sheet, mode per row, header row from whichever mode saved first
+                sheet_mode = None
+                mode_maps = {
+                    mode: {i + 3: column for i, column in enumerate(["item"] + columns)}
+                    for mode, columns in MODE_COLUMNS.items()
+                }
+            elif header[:2] == ("Timestamp", "Customer") and ws.title in MODE_COLUMNS:
+                sheet_mode = ws.title
+                mapping = {i + 2: c for i, c in column_map(sheet_mode, header[2:]).items()}
+            else:
+                logging.warning(f"Skipping sheet '{ws.title}' in {path}: unrecognised layout")
+                continue
+
+            current = None
+            for values in rows:
+                if not values or values[0] is None:
+                    continue
+                timestamp = str(values[0])
+                customer = "" if values[1] is None else str(values[1])
+                mode = sheet_mode or str(values[2] or "")
+                row_map = mapping if sheet_mode else mode_maps.get(mode)
+                if row_map is None:
+                    continue
+                key = (timestamp, customer, mode)
+                if current is None or current["key"] != key:
+                    current = {
+                        "key": key,
+                        "timestamp": timestamp,
+                        "customer": customer,
+                        "mode": mode,
+                        "kata_amount": 0.0,
+                        "items": [],
+                    }
+                    invoices.append(current)
+                item = normalise_row(mode, row_map, values, len(current["items"]) + 1)
+                if item:
+                    current["items"].append(item)
+    finally:
+        wb.close()
+    return [invoice for invoice in invoices if invoice["items"]]
+
+
+def import_directory(directory, store, workers=None):
+    """Import every ``Invoice_*.xlsx`` in ``directory`` into ``store``.
+
+    Invoices already in the store (same timestamp, customer and mode) are
+    skipped, so re-running an import or importing days that were also
+    saved through the app does not duplicate them.
+
+    Returns:
+        tuple: ``(files, invoices_imported, invoices_skipped)``.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "Invoice_*.xlsx")))
+    if not paths:
+        return 0, 0, 0
+
+    existing = store.existing_keys()
+    skipped = 0
+    pending = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4))
+        for invoices in executor.map(_read_safely, paths, chunksize=chunksize):
+            for invoice in invoices:
+                key = invoice.pop("key")
+                if key in existing:
+                    skipped += 1
+                    continue
+                existing.add(key)
+                pending.append(invoice)
+    imported = store.bulk_load(pending)
+    return len(paths), imported, skipped
+
+
+def _read_safely(path):
+    try:
+        return read_workbook(path)
+    except Exception as e:
+        logging.error(f"Could not import {path}: {e}")
+        return []
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Import historical Invoice_*.xlsx files into the invoice store.")
+    parser.add_argument("directory", nargs="?", default=None, help="Folder holding the workbooks (default: Documents)")
+    parser.add_argument("--db", default=None, help="Invoice store path (default: Documents/invoices.db)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    directory = args.directory or default_documents_dir()
+    store = InvoiceStore(args.db)
+    started = time.perf_counter()
+    try:
+        files, imported, skipped = import_directory(directory, store, args.workers)
+    finally:
+        store.close()
+    elapsed = time.perf_counter() - started
+    logging.info(
+        f"Imported {imported} invoice(s) from {files} file(s) in {elapsed:.1f}s "
+        f"({skipped} already in the store)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@ import win32api
 from openpyxl import Workbook, load_workbook
 from openpyxl.utils import get_column_letter
 from excel_handler import save_to_excel
+from customer_directory import CustomerDirectory
+from invoice_engine import MODES as ENGINE_MODES, MONEY_SCALE, calculate_row
 from printer_handler import print_invoice as direct_print_invoice, generate_pdf
 from print_utils import print_with_dialog, load_print_setting, open_settings_window
 from tkinter import ttk
@@ -81,28 +83,18 @@ ITEM_LIST = [
     "AWARI"
 ]
 
-# Mode configurations
+# Mode configurations, built from the shared mode specs
+def _row_amount(mode, widgets):
+    """Amount of one table row: item and entries, without the amount label and delete button."""
+    return calculate_row(mode, [w.get() for w in widgets[:-2]]).amount / MONEY_SCALE
+
 MODES = {
-    "Patti": {
-        "headers": ["Item", "Packet", "Quantity", "Rate", "Hamali", "Amount"],
-        "fields": 5,
-        "calc": lambda w: validate_float(w[2].get()) * validate_float(w[3].get()) + 
-                        validate_float(w[1].get()) * validate_float(w[4].get())
-    },
-    "Kata": {
-        "headers": ["Item", "Net Wt", "Less%", "Rate", "Hamali Rate", "Amount"],
-        "fields": 5,
-        "calc": lambda w: (validate_float(w[1].get()) * (1 - min(validate_float(w[2].get()), 100) / 100) * 
-                          validate_float(w[3].get()) + 
-                          int(validate_float(w[1].get()) / 60) * validate_float(w[4].get()))
-    },
-    "Barthe": {
-        "headers": ["Item", "Packet", "Weight", "+/-", "Rate", "Hamali", "Amount"],
-        "fields": 6,
-        "calc": lambda w: ((validate_float(w[1].get()) * validate_float(w[2].get()) + 
-                           validate_float(w[3].get())) * validate_float(w[4].get()) + 
-                          validate_float(w[1].get()) * validate_float(w[5].get()))
+    name: {
+        "headers": mode.headers,
+        "fields": len(mode.field_names) + 1,  # Item plus the input fields
+        "calc": lambda w, name=name: _row_amount(name, w)
     }
+    for name, mode in ENGINE_MODES.items()
 }
 
 def validate_float(value):
@@ -161,33 +153,6 @@ def load_print_setting():
     except Exception:
         return default["print_mode"]
 
-def load_recent_customers():
-    """Load recent customer names from recent_customers.json.
-
-    Returns:
-        list: List of recent customer names.
-    """
-    try:
-        with open('recent_customers.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
-
-def save_recent_customer(name):
-    """Save a customer name to recent_customers.json.
-
-    Args:
-        name (str): Customer name to save.
-    """
-    if not name or name == "Unknown Customer":
-        return
-    customers = load_recent_customers()
-    if name not in customers:
-        customers.append(name)
-        customers = customers[-10:]  # Keep last 10 customers
-        with open('recent_customers.json', 'w') as f:
-            json.dump(customers, f, indent=4)
-
 ctk.set_appearance_mode("light")
 ctk.set_default_color_theme("blue")
 
@@ -208,6 +173,7 @@ class InvoiceApp(ctk.CTk):
         self.undo_stack = []
         self.redo_stack = []
         self.max_rows = self.config.get("max_rows", 100)
+        self.customers = CustomerDirectory(store_path=self.config.get("store_path"))
 
         self.build_ui()
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -240,7 +206,13 @@ class InvoiceApp(ctk.CTk):
         ctk.CTkLabel(customer_frame, text=_("Customer Name:"), font=LABEL_FONT).pack(side="left", padx=(0, 10))
         self.customer_entry = ctk.CTkEntry(customer_frame, width=400, font=ENTRY_FONT, height=35)
         self.customer_entry.pack(side="left")
-        customer_frame.pack(pady=(20, 30))
+        self.customer_entry.bind("<KeyRelease>", self.on_customer_typed)
+        customer_frame.pack(pady=(20, 0))
+
+        # Other matches for the typed name; the buttons are reused as the text changes
+        self.suggestion_frame = ctk.CTkFrame(self, fg_color="transparent", height=30)
+        self.suggestion_frame.pack(pady=(4, 26))
+        self.suggestion_buttons = []
 
         # Table container
         self.table_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -515,7 +487,7 @@ class InvoiceApp(ctk.CTk):
     def save_to_excel(self):
         """Save invoice data to Excel."""
         customer = self.validate_customer_name(self.customer_entry.get().strip())
-        save_recent_customer(customer)
+        self.customers.touch(customer)
         try:
             # Get additional data for saving
             additional_data = {}
@@ -528,6 +500,53 @@ class InvoiceApp(ctk.CTk):
             logger.error(f"Error saving to Excel: {str(e)}")
             messagebox.showerror(_("Save Error"), str(e))
 
+    def on_customer_typed(self, event):
+        """Complete the customer name inline and list other matches.
+
+        The best match (most recently used first) is filled in after the
+        cursor with the rest selected, so typing on replaces it and Tab or
+        Enter accepts it.
+        """
+        if event.keysym in ("Return", "KP_Enter", "Tab"):
+            self.customer_entry.select_clear()
+            self.customer_entry.icursor("end")
+            self.show_customer_suggestions([])
+            return
+        typed = self.customer_entry.get()
+        if event.keysym not in ("BackSpace", "Delete", "Left", "Right", "Home", "End") and event.char:
+            completion = self.customers.complete(typed)
+            # complete() matches on the normalised text; only splice where the raw text lines up
+            if (completion and len(completion) > len(typed)
+                    and completion[:len(typed)].casefold() == typed.casefold()):
+                self.customer_entry.delete(0, "end")
+                self.customer_entry.insert(0, typed + completion[len(typed):])
+                self.customer_entry.select_range(len(typed), "end")
+                self.customer_entry.icursor(len(typed))
+        matches = self.customers.search(typed, limit=4) if typed.strip() else []
+        shown = self.customer_entry.get()
+        self.show_customer_suggestions([name for name in matches if name != shown][:3])
+
+    def show_customer_suggestions(self, names):
+        """Show ``names`` as buttons under the customer entry."""
+        while len(self.suggestion_buttons) < len(names):
+            button = ctk.CTkButton(self.suggestion_frame, font=LABEL_FONT, height=26,
+                                   fg_color="#e3f2fd", text_color="#1976d2", hover_color="#bbdefb")
+            self.suggestion_buttons.append(button)
+        for index, button in enumerate(self.suggestion_buttons):
+            if index < len(names):
+                name = names[index]
+                button.configure(text=name, command=lambda name=name: self.pick_customer(name))
+                button.grid(row=0, column=index, padx=4)
+            else:
+                button.grid_remove()
+
+    def pick_customer(self, name):
+        """Put a suggested customer in the entry."""
+        self.customer_entry.delete(0, "end")
+        self.customer_entry.insert(0, name)
+        self.show_customer_suggestions([])
+        self.customer_entry.focus_set()
+
     def validate_customer_name(self, name):
         """Validate and sanitize customer name.
 
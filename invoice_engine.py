@@ -0,0 +1,299 @@
+"""Widget-free invoice calculations for Patti, Kata and Barthe.
+
+Rows are plain sequences in table order: the item name followed by the
+mode's input fields; anything after them (a saved amount, the delete
+button's empty cell) is ignored. Values may be numbers or the text typed
+into the table. Nothing here touches Tk, so the same formulas serve the
+apps, reports, re-imports and server-side checks. The formulas come from
+the declarative specs in ``modes``, resolved once into plain closures.
+
+All arithmetic is fixed point on integers: money in paise, weights and
+packet counts in thousandths (grams for kg), percentages in hundredths.
+Text is parsed straight into those units, so totals are exact sums and
+only formatting for display divides again. Rounding is half away from
+zero: the charged weight to the gram, then weight x rate and the hamali
+charge each to the paisa.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import NamedTuple
+
+from modes import MODE_SPECS
+
+MONEY_SCALE = 100     # paise per rupee
+QTY_SCALE = 1000      # grams per kg, thousandths of a packet
+PERCENT_SCALE = 100   # hundredths of a percent
+FULL_PERCENT = 100 * PERCENT_SCALE
+
+UNIT_SCALES = {
+    "count": QTY_SCALE,
+    "weight": QTY_SCALE,
+    "money": MONEY_SCALE,
+    "percent": PERCENT_SCALE,
+}
+
+
+class RowResult(NamedTuple):
+    """Calculated figures for one table row, in fixed-point units."""
+    amount: int    # paise
+    quantity: int  # Patti quantity, Kata final weight, Barthe total weight (thousandths)
+    packets: int   # thousandths of a packet
+    hamali: int    # paise of hamali charged on the row
+
+
+class InvoiceResult(NamedTuple):
+    """Calculated figures for a whole invoice, in paise."""
+    rows: list
+    subtotal: int
+    kata_amount: int
+    total: int
+
+
+def parse_cell(value):
+    """Parse a table cell into a float, treating blanks and junk as 0."""
+    try:
+        text = str(value).replace('₹', '').replace(',', '').strip()
+        return float(text) if text else 0.0
+    except ValueError:
+        return 0.0
+
+
+def to_fixed(value, scale):
+    """Parse a number or table cell into whole ``1/scale`` units (junk is 0).
+
+    Text goes through ``Decimal`` so "10.05" is exactly 1005 paise.
+    """
+    if isinstance(value, int):
+        return value * scale
+    text = str(value).replace('₹', '').replace(',', '').strip()
+    if text.isdigit():
+        return int(text) * scale
+    try:
+        return int((Decimal(text) * scale).to_integral_value(rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError, OverflowError):
+        return 0
+
+
+def format_fixed(value, scale=MONEY_SCALE, places=2):
+    """Format fixed-point units for display, e.g. 5600 paise -> "56.00"."""
+    return f"{value / scale:.{places}f}"
+
+
+def format_money(paise):
+    """Format paise as rupees with two decimals."""
+    return format_fixed(paise, MONEY_SCALE, 2)
+
+
+def _div_round(numerator, denominator):
+    """Integer division rounded half away from zero."""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if 2 * remainder >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def after_less(weight, less_percent):
+    """Weight after a Less% deduction, rounded to the gram.
+
+    Args:
+        weight (int): Thousandths of a kg.
+        less_percent (int): Hundredths of a percent; nothing is left at 100% or more.
+    """
+    if less_percent >= FULL_PERCENT:
+        return 0
+    return _div_round(weight * (FULL_PERCENT - less_percent), FULL_PERCENT)
+
+
+def whole_packets(weight, packet_weight):
+    """Whole packets in ``weight`` (both in thousandths); none for a non-positive weight."""
+    return weight // packet_weight if weight > 0 else 0
+
+
+class Arithmetic(NamedTuple):
+    """The operations a row calculator is built over.
+
+    ``SCALAR`` works on Python integers; ``invoice_vector`` supplies
+    element-wise NumPy versions so the same calculator runs over columns.
+    """
+    div_round: object      # (numerator, denominator) -> rounded half away from zero
+    after_less: object     # (weight, less_percent) -> weight kept
+    whole_packets: object  # (weight, packet_weight) -> whole packets
+    zero: object           # (like) -> zero of the same shape
+    result: type           # (amount, quantity, packets, hamali) -> result
+
+
+SCALAR = Arithmetic(_div_round, after_less, whole_packets, lambda like: 0, RowResult)
+
+
+class CompiledMode:
+    """A mode spec turned into a row calculator and table/receipt layouts."""
+
+    def __init__(self, name, spec):
+        self.name = name
+        fields = spec["fields"]
+        self.field_names = tuple(field["name"] for field in fields)
+        self.scales = [UNIT_SCALES[field["unit"]] for field in fields]
+        self.headers = ["Item"] + [field["header"] for field in fields] + ["Amount"]
+        self.print_headers = ["Item"] + [field["print"] for field in fields] + ["Amt"]
+        self.print_widths = [spec["item_width"]] + [field["width"] for field in fields] + [spec["amount_width"]]
+        self.print_format = " ".join(
+            ["{:<%d}" % self.print_widths[0]] + ["{:>%d}" % width for width in self.print_widths[1:]]
+        )
+        self.spec = spec
+        self.calculate = build_calculator(name, spec, self.field_names)
+
+    def print_row(self, values):
+        """Format one receipt line, cutting each value to its column width."""
+        return self.print_format.format(*(str(v)[:w] for v, w in zip(values, self.print_widths)))
+
+
+def build_calculator(name, spec, field_names, ops=SCALAR):
+    """Build a mode's row calculator from its spec.
+
+    The calculator takes the parsed input values as positional arguments
+    and returns ``ops.result(amount, quantity, packets, hamali)``. Field
+    positions and rules are looked up here, once; the closure only does
+    the arithmetic, through ``ops``.
+
+    Raises:
+        ValueError: If the spec refers to a field it does not define.
+    """
+    positions = {field: index for index, field in enumerate(field_names)}
+
+    def position(key):
+        if key is None:
+            return None
+        try:
+            return positions[key]
+        except KeyError:
+            raise ValueError(f"Mode {name}: unknown field {key!r}") from None
+
+    weight_rule = spec["weight"]
+    hamali_rule = spec["hamali"]
+    source = position(weight_rule["from"])
+    times = position(weight_rule.get("times"))
+    less = position(weight_rule.get("less_percent"))
+    plus = position(weight_rule.get("plus"))
+    rate = position(spec["rate"])
+    hamali_rate = position(hamali_rule["rate"])
+    on = hamali_rule["on"]
+    per_count = on not in ("packets", "weight", "row")
+    count = position(on) if per_count else None
+    packet_weight = hamali_rule.get("packet_weight", 0) * QTY_SCALE
+    div_round, less_by, packets_in, zero, result = ops
+
+    def calculate(*values):
+        gross = values[source]
+        if times is not None:
+            gross = div_round(values[times] * gross, QTY_SCALE)
+        weight = gross
+        if less is not None:
+            weight = less_by(weight, values[less])
+        if plus is not None:
+            weight = weight + values[plus]
+        if per_count:
+            packets = values[count]
+            charge = div_round(packets * values[hamali_rate], QTY_SCALE)
+        elif on == "packets":
+            whole = packets_in(gross, packet_weight)
+            packets = whole * QTY_SCALE
+            charge = whole * values[hamali_rate]
+        elif on == "weight":
+            packets = zero(gross)
+            charge = div_round(weight * values[hamali_rate], QTY_SCALE)
+        else:
+            packets = zero(gross)
+            charge = values[hamali_rate]
+        goods = div_round(weight * values[rate], QTY_SCALE)
+        return result(goods + charge, weight, packets, charge)
+
+    return calculate
+
+
+MODES = {name: CompiledMode(name, spec) for name, spec in MODE_SPECS.items()}
+
+# Input fields after Item, in table order
+MODE_FIELDS = {name: mode.field_names for name, mode in MODES.items()}
+CALCULATORS = {name: mode.calculate for name, mode in MODES.items()}
+
+
+def _calculator(mode):
+    try:
+        return CALCULATORS[mode], MODES[mode].scales
+    except KeyError:
+        raise ValueError(f"Unknown invoice mode: {mode}") from None
+
+
+def field_scales(mode):
+    """Fixed-point scale of each input field of ``mode``, in table order.
+
+    Raises:
+        ValueError: If ``mode`` is unknown.
+    """
+    return _calculator(mode)[1]
+
+
+def calculate_fixed(mode, values):
+    """Calculate one row from already-parsed fixed-point input values."""
+    return _calculator(mode)[0](*values)
+
+
+def calculate_row(mode, row):
+    """Calculate one row.
+
+    Args:
+        mode (str): "Patti", "Kata" or "Barthe".
+        row (sequence): Item name followed by the mode's input fields.
+
+    Returns:
+        RowResult: Amount, quantity/final weight, packets and hamali.
+
+    Raises:
+        ValueError: If ``mode`` is unknown.
+    """
+    return calculate_rows(mode, [row])[0]
+
+
+def calculate_rows(mode, rows):
+    """Calculate every row of one mode in a single call.
+
+    Returns:
+        list: One ``RowResult`` per row, in order.
+    """
+    calc, scales = _calculator(mode)
+    width = len(scales)
+    parse = to_fixed
+    results = []
+    append = results.append
+    for row in rows:
+        values = [parse(value, scale) for value, scale in zip(row[1:1 + width], scales)]
+        if len(values) < width:
+            values.extend([0] * (width - len(values)))
+        append(calc(*values))
+    return results
+
+
+def calculate_invoice(mode, rows, kata_amount=0):
+    """Calculate an invoice: every row plus the total.
+
+    The separate Kata amount is only added in Kata mode, as in the apps.
+    """
+    results = calculate_rows(mode, rows)
+    subtotal = sum(result.amount for result in results)
+    kata_amount = to_fixed(kata_amount, MONEY_SCALE) if mode == "Kata" else 0
+    return InvoiceResult(results, subtotal, kata_amount, subtotal + kata_amount)
+
+
+def calculate_batch(invoices):
+    """Recalculate many saved invoices in one call.
+
+    Args:
+        invoices (iterable): Record dicts with ``mode``, ``rows`` and an
+            optional ``kata_amount``, as stored in the ledger.
+
+    Returns:
+        list: One ``InvoiceResult`` per invoice, in order.
+    """
+    return [
+        calculate_invoice(record["mode"], record["rows"], record.get("kata_amount", 0))
+        for record in invoices
+    ]
@@ -0,0 +1,128 @@
+"""Invoice numbers shared by every counter that uses the same store.
+
+The next free number lives in an ``InvoiceSequence`` table inside the
+invoice database. A terminal takes a whole block of numbers at a time
+under SQLite's write lock (``BEGIN IMMEDIATE``) and hands them out from
+memory, so counters touch the shared file only once per block. Numbers
+always increase and are never issued twice; the unused tail of a block
+is simply skipped when the app closes.
+
+Blocks are reserved on a background thread before the current one runs
+out, so handing out a number never waits on another counter's lock.
+"""
+import logging
+import os
+import sqlite3
+import threading
+
+from invoice_store import STORE_FILENAME
+from ledger import default_documents_dir
+
+BLOCK_SIZE = 50
+LOW_WATER = 10  # reserve the next block once fewer numbers than this are left
+LOCK_TIMEOUT = 10  # seconds to wait for another counter's reservation
+SEQUENCE_NAME = "invoice"
+
+
+class InvoiceNumberAllocator:
+    """Hands out invoice numbers from blocks reserved in the shared store.
+
+    Args:
+        path (str): Invoice database (default: Documents/invoices.db).
+        block_size (int): Numbers taken from the store at a time.
+        low_water (int): Numbers left in reserve that trigger the next block.
+    """
+
+    def __init__(self, path=None, block_size=BLOCK_SIZE, low_water=LOW_WATER):
+        self.path = path or os.path.join(default_documents_dir(), STORE_FILENAME)
+        self.block_size = block_size
+        self.low_water = low_water
+        self._blocks = []  # reserved (next, end) ranges, oldest first
+        self._refilling = False
+        self._ready = threading.Condition()
+
+    @property
+    def available(self):
+        """Numbers reserved and not yet handed out."""
+        return sum(end - start for start, end in self._blocks)
+
+    def prefetch(self):
+        """Reserve the next block on a background thread if the reserve is low."""
+        with self._ready:
+            if self._refilling or self.available >= self.low_water:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, name="invoice-numbers", daemon=True).start()
+
+    def next_number(self, timeout=0):
+        """Return the next invoice number from the reserve.
+
+        Never opens the store itself; a new block is reserved in the
+        background when the reserve runs low.
+
+        Args:
+            timeout (float): Seconds to wait for a reservation in progress.
+
+        Raises:
+            TimeoutError: If no number is reserved yet (the store is locked
+                by another counter or cannot be opened); a reservation is
+                already under way, so a later call can succeed.
+        """
+        self.prefetch()
+        with self._ready:
+            if not self._blocks:
+                self._ready.wait_for(lambda: self._blocks or not self._refilling, timeout)
+            if not self._blocks:
+                raise TimeoutError("No invoice numbers reserved yet")
+            number, end = self._blocks[0]
+            if number + 1 < end:
+                self._blocks[0] = (number + 1, end)
+            else:
+                self._blocks.pop(0)
+        self.prefetch()
+        return number
+
+    def _refill(self):
+        try:
+            block = self._reserve_block()
+        except Exception as e:
+            logging.error(f"Could not reserve invoice numbers: {e}")
+            block = None
+        with self._ready:
+            if block:
+                self._blocks.append(block)
+            self._refilling = False
+            self._ready.notify_all()
+
+    def _reserve_block(self):
+        """Take the next block from the store; returns its ``(start, end)`` range."""
+        conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS InvoiceSequence (name TEXT PRIMARY KEY, nextNo INTEGER NOT NULL)"
+            )
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT nextNo FROM InvoiceSequence WHERE name = ?", (SEQUENCE_NAME,)).fetchone()
+                start = row[0] if row else self._first_number(conn)
+                conn.execute(
+                    "INSERT OR REPLACE INTO InvoiceSequence (name, nextNo) VALUES (?, ?)",
+                    (SEQUENCE_NAME, start + self.block_size),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        logging.info(f"Reserved invoice numbers {start}-{start + self.block_size - 1}")
+        return start, start + self.block_size
+
+    @staticmethod
+    def _first_number(conn):
+        """Start after any numbered invoice already stored, else at 1."""
+        try:
+            highest = conn.execute("SELECT MAX(invoiceNo) FROM Invoices").fetchone()[0]
+        except sqlite3.OperationalError:
+            highest = None  # no Invoices table (or no invoiceNo column) yet
+        return (highest or 0) + 1
@@ -0,0 +1,281 @@
+"""Indexed SQLite store for saved invoices.
+
+Uses the ``Invoices`` / ``InvoiceItems`` schema from ``GVM.html``'s
+``initializeDatabase`` so the desktop apps and the web page agree on one
+record layout. The database runs in WAL mode so lookups never wait on a
+save in progress; the per-day Excel files become an export of this data.
+
+Invoices are upserted by ``invoiceKey`` (see ``ledger.invoice_key``), so
+saving the same invoice twice stores it once.
+"""
+import logging
+import os
+import sqlite3
+
+from invoice_engine import MODES, MONEY_SCALE, QTY_SCALE, calculate_fixed, parse_cell, to_fixed
+from ledger import content_hash, default_documents_dir, invoice_key
+
+STORE_FILENAME = "invoices.db"
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS Invoices (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        mode TEXT,
+        customerName TEXT,
+        date TEXT,
+        additionalAmount REAL,
+        grandTotal REAL,
+        invoiceKey TEXT,
+        contentHash TEXT,
+        invoiceNo INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS InvoiceItems (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        invoiceId INTEGER,
+        slNo INTEGER,
+        item TEXT,
+        packet REAL,
+        quantity REAL,
+        rate REAL,
+        hamali REAL,
+        netWeight REAL,
+        lessPercent REAL,
+        finalWeight REAL,
+        packets REAL,
+        hamaliRate REAL,
+        weight REAL,
+        adjustment REAL,
+        amount REAL,
+        FOREIGN KEY (invoiceId) REFERENCES Invoices(id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_invoices_date ON Invoices(date)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_customer ON Invoices(customerName, date)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_mode ON Invoices(mode, date)",
+    "CREATE INDEX IF NOT EXISTS idx_items_invoice ON InvoiceItems(invoiceId)",
+    "CREATE INDEX IF NOT EXISTS idx_items_item ON InvoiceItems(item)",
+]
+
+# Columns added after the first release, applied to older databases on open
+ADDED_COLUMNS = {"Invoices": [("invoiceKey", "TEXT"), ("contentHash", "TEXT"), ("invoiceNo", "INTEGER")]}
+ADDED_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_invoices_key ON Invoices(invoiceKey)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_no ON Invoices(invoiceNo)",
+]
+
+ITEM_COLUMNS = [
+    "slNo", "item", "packet", "quantity", "rate", "hamali", "netWeight",
+    "lessPercent", "finalWeight", "packets", "hamaliRate", "weight",
+    "adjustment", "amount",
+]
+
+# Column each table cell (after Item) maps to, per mode
+MODE_COLUMNS = {
+    "Patti": ["packet", "quantity", "rate", "hamali", "amount"],
+    "Kata": ["netWeight", "lessPercent", "rate", "hamaliRate", "amount"],
+    "Barthe": ["packet", "weight", "adjustment", "rate", "hamaliRate", "amount"],
+}
+
+
+def items_from_rows(mode, rows):
+    """Convert table rows into ``InvoiceItems`` dicts.
+
+    Args:
+        mode (str): "Patti", "Kata" or "Barthe".
+        rows (list): Row values as saved by ``save_to_excel``: item name
+            first, then the mode's fields and the amount.
+
+    Returns:
+        list: One dict per row keyed by ``ITEM_COLUMNS``.
+    """
+    columns = MODE_COLUMNS.get(mode, [])
+    items = []
+    for sl_no, row in enumerate(rows, 1):
+        item = dict.fromkeys(ITEM_COLUMNS)
+        item["slNo"] = sl_no
+        item["item"] = str(row[0]).strip() if row else ""
+        for column, value in zip(columns, row[1:]):
+            item[column] = parse_cell(value)
+        items.append(complete_item(mode, item))
+    return items
+
+
+def complete_item(mode, item):
+    """Fill in the columns a mode derives from its inputs (in place)."""
+    if mode not in MODES:
+        return item
+    inputs = MODE_COLUMNS[mode][:-1]  # the mode's fields, without amount
+    values = [to_fixed(item[column] or 0, scale) for column, scale in zip(inputs, MODES[mode].scales)]
+    result = calculate_fixed(mode, values)
+    if mode == "Kata":
+        item["finalWeight"] = result.quantity / QTY_SCALE
+        item["packets"] = result.packets // QTY_SCALE
+    elif mode == "Barthe":
+        item["quantity"] = result.quantity / QTY_SCALE
+    return item
+
+
+class InvoiceStore:
+    """SQLite system of record for invoices."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(default_documents_dir(), STORE_FILENAME)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # FULL makes each commit durable before the save journal retires it
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self.conn:
+            for statement in SCHEMA:
+                self.conn.execute(statement)
+            for table, columns in ADDED_COLUMNS.items():
+                present = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+                for name, sql_type in columns:
+                    if name not in present:
+                        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+            for statement in ADDED_INDEXES:
+                self.conn.execute(statement)
+
+    def save_invoice(self, record):
+        """Upsert one invoice and its items in a single transaction.
+
+        Args:
+            record (dict): Invoice record as appended to the ledger; the
+                optional ``kata_amount`` key is stored as ``additionalAmount``.
+
+        Returns:
+            int: The invoice id (the existing one if it was saved before).
+        """
+        return self.save_many([record])[0]
+
+    def save_many(self, records):
+        """Upsert several invoices in one transaction.
+
+        An invoice whose key is already stored with the same content is left
+        alone; with different content its row and items are replaced.
+
+        Returns:
+            list: The invoice ids, in ``records`` order.
+        """
+        with self.conn:
+            return [self._insert(record) for record in records]
+
+    def bulk_load(self, invoices):
+        """Insert already-normalised invoices in one transaction.
+
+        Args:
+            invoices (iterable): Dicts with ``timestamp``, ``customer``,
+                ``mode``, ``kata_amount`` and ``items`` (``ITEM_COLUMNS`` dicts).
+
+        Returns:
+            int: Number of invoices inserted.
+        """
+        count = 0
+        with self.conn:
+            for invoice in invoices:
+                self._insert_items(invoice, invoice["items"])
+                count += 1
+        return count
+
+    def existing_keys(self):
+        """``(date, customerName, mode)`` of every stored invoice, for de-duplication."""
+        return {tuple(row) for row in self.conn.execute("SELECT date, customerName, mode FROM Invoices")}
+
+    def _insert(self, record):
+        key = invoice_key(record)
+        digest = content_hash(record)
+        existing = self.conn.execute(
+            "SELECT id, contentHash FROM Invoices WHERE invoiceKey = ?", (key,)
+        ).fetchone()
+        if existing and existing["contentHash"] == digest:
+            logging.debug(f"Invoice {key} already stored, skipping")
+            return existing["id"]
+        items = items_from_rows(record["mode"], record["rows"])
+        if existing:
+            self.conn.execute("DELETE FROM InvoiceItems WHERE invoiceId = ?", (existing["id"],))
+            self.conn.execute("DELETE FROM Invoices WHERE id = ?", (existing["id"],))
+        return self._insert_items(record, items, key, digest, existing["id"] if existing else None)
+
+    def _insert_items(self, record, items, key=None, digest=None, invoice_id=None):
+        additional = to_fixed(record.get("kata_amount", 0), MONEY_SCALE)
+        # Summed in paise so the stored total is exact; the columns stay REAL for GVM.html
+        grand_total = (sum(to_fixed(item["amount"] or 0, MONEY_SCALE) for item in items) + additional) / MONEY_SCALE
+        additional /= MONEY_SCALE
+        cur = self.conn.execute(
+            "INSERT INTO Invoices (id, mode, customerName, date, additionalAmount, grandTotal, "
+            "invoiceKey, contentHash, invoiceNo) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (invoice_id, record["mode"], record["customer"], record["timestamp"], additional,
+             grand_total, key, digest, record.get("invoice_no")),
+        )
+        invoice_id = cur.lastrowid
+        self.conn.executemany(
+            f"INSERT INTO InvoiceItems (invoiceId, {', '.join(ITEM_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' * len(ITEM_COLUMNS))})",
+            [[invoice_id] + [item[c] for c in ITEM_COLUMNS] for item in items],
+        )
+        logging.debug(f"Stored invoice {invoice_id} ({record['mode']}, {len(items)} items)")
+        return invoice_id
+
+    def invoice_by_number(self, invoice_no):
+        """The invoice printed with ``invoice_no``, or None."""
+        return self.conn.execute("SELECT * FROM Invoices WHERE invoiceNo = ?", (invoice_no,)).fetchone()
+
+    def invoices_for_customer(self, customer, start=None, end=None):
+        """Invoices for ``customer``, optionally limited to a date range.
+
+        ``start`` and ``end`` are ``YYYY-MM-DD`` strings; ``end`` is inclusive.
+        """
+        sql = "SELECT * FROM Invoices WHERE customerName = ?"
+        params = [customer]
+        if start:
+            sql += " AND date >= ?"
+            params.append(start)
+        if end:
+            sql += " AND date < ?"
+            params.append(end + "~")  # sorts after any time on that day
+        return self.conn.execute(sql + " ORDER BY date", params).fetchall()
+
+    def customer_history(self):
+        """One row per customer: ``customerName``, ``invoices`` and ``lastDate``."""
+        return self.conn.execute(
+            "SELECT customerName, COUNT(*) AS invoices, MAX(date) AS lastDate "
+            "FROM Invoices WHERE customerName IS NOT NULL GROUP BY customerName"
+        ).fetchall()
+
+    def invoices_on(self, date_str, mode=None):
+        """Invoices saved on ``date_str``, optionally for one mode."""
+        sql = "SELECT * FROM Invoices WHERE date >= ? AND date < ?"
+        params = [date_str, date_str + "~"]
+        if mode:
+            sql = "SELECT * FROM Invoices WHERE mode = ? AND date >= ? AND date < ?"
+            params.insert(0, mode)
+        return self.conn.execute(sql + " ORDER BY date", params).fetchall()
+
+    def items_for_invoice(self, invoice_id):
+        """Line items of one invoice in table order."""
+        return self.conn.execute(
+            "SELECT * FROM InvoiceItems WHERE invoiceId = ? ORDER BY slNo", (invoice_id,)
+        ).fetchall()
+
+    def item_sales(self, item, start=None, end=None):
+        """Line items for ``item`` joined with their invoice's customer and date."""
+        sql = (
+            "SELECT i.date, i.customerName, i.mode, it.* FROM InvoiceItems it "
+            "JOIN Invoices i ON i.id = it.invoiceId WHERE it.item = ?"
+        )
+        params = [item]
+        if start:
+            sql += " AND i.date >= ?"
+            params.append(start)
+        if end:
+            sql += " AND i.date < ?"
+            params.append(end + "~")
+        return self.conn.execute(sql + " ORDER BY i.date", params).fetchall()
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
@@ -0,0 +1,189 @@
+"""Columnar NumPy batch calculations for large invoice volumes.
+
+Re-pricing a day after a rate correction or validating imported history
+means millions of rows; calling the scalar calculator per row is too slow.
+Here each input field is an ``int64`` column in the engine's fixed-point
+units and every mode's calculator, built by ``invoice_engine`` over
+element-wise NumPy operations, runs once over whole columns. The
+arithmetic is the same integer arithmetic with the same rounding, so
+results are bit-identical to ``invoice_engine``.
+
+``int64`` wraps around silently, so every batch is range-checked first:
+the calculator is run once over the column maxima as float magnitudes,
+which bounds every product and sum the ``int64`` run would make. A batch
+that could overflow, or holds a value beyond ``int64`` at all, is
+calculated on the scalar path with Python integers instead.
+
+NumPy is only needed by this module; the apps never import it.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from invoice_engine import FULL_PERCENT, MODES, Arithmetic, build_calculator, calculate_fixed, to_fixed
+
+
+class ColumnResult(NamedTuple):
+    """Calculated columns, in the same units as ``invoice_engine.RowResult``."""
+    amount: np.ndarray
+    quantity: np.ndarray
+    packets: np.ndarray
+    hamali: np.ndarray
+
+    def total(self):
+        """Sum of the amount column in paise, as a Python int."""
+        return int(self.amount.sum())
+
+
+def _div_round(numerator, denominator):
+    """Element-wise integer division rounded half away from zero."""
+    quotient, remainder = np.divmod(np.abs(numerator), denominator)
+    quotient = quotient + (2 * remainder >= denominator)
+    return np.where(numerator >= 0, quotient, -quotient)
+
+
+def after_less(weight, less_percent):
+    """Element-wise ``invoice_engine.after_less``."""
+    kept = _div_round(weight * (FULL_PERCENT - less_percent), FULL_PERCENT)
+    return np.where(less_percent >= FULL_PERCENT, 0, kept)
+
+
+def whole_packets(weight, packet_weight):
+    """Element-wise ``invoice_engine.whole_packets``."""
+    return np.where(weight > 0, weight // packet_weight, 0)
+
+
+INT64_SAFE = float(2 ** 62)  # below int64's 2**63, with room for float rounding in the bound
+
+VECTOR = Arithmetic(_div_round, after_less, whole_packets, np.zeros_like, ColumnResult)
+
+_CALCULATORS = {}
+
+
+def _calculator(mode):
+    """``mode``'s row calculator built over NumPy operations (cached)."""
+    if mode not in _CALCULATORS:
+        if mode not in MODES:
+            raise ValueError(f"Unknown invoice mode: {mode}")
+        compiled = MODES[mode]
+        _CALCULATORS[mode] = build_calculator(mode, compiled.spec, compiled.field_names, VECTOR)
+    return _CALCULATORS[mode]
+
+
+def fits_int64(mode, values):
+    """True if no intermediate of ``mode``'s calculation can leave ``int64``.
+
+    Runs the calculator once over the largest magnitude of each column,
+    with every step replaced by a float upper bound (products of
+    magnitudes, divisions rounded up, a Less% counted as an addition).
+    Each bound grows with its inputs, so the result covers every row.
+
+    Args:
+        values (list): One ``int64`` column per input field, in field order.
+    """
+    peak = [0.0]
+
+    def note(magnitude):
+        peak[0] = max(peak[0], magnitude)
+        return magnitude
+
+    def div_round(numerator, denominator):
+        return note(numerator) / denominator + 1
+
+    def less_by(weight, less_percent):
+        return note(weight * (FULL_PERCENT + less_percent)) / FULL_PERCENT + 1
+
+    def result(*columns):
+        for magnitude in columns:
+            note(magnitude)
+
+    bound = Arithmetic(div_round, less_by, lambda weight, packet_weight: weight / packet_weight,
+                       lambda like: 0.0, result)
+    compiled = MODES[mode]
+    maxima = [float(np.abs(column).max()) if len(column) else 0.0 for column in values]
+    note(max(maxima, default=0.0))
+    build_calculator(mode, compiled.spec, compiled.field_names, bound)(*maxima)
+    return peak[0] < INT64_SAFE
+
+
+def _scalar_columns(mode, values):
+    """Calculate rows of fixed-point values with Python integers, as columns.
+
+    Columns that fit stay ``int64``; any that do not are ``object`` arrays
+    of exact Python integers.
+    """
+    results = [calculate_fixed(mode, [int(value) for value in row]) for row in zip(*values)]
+    columns = []
+    for field in zip(*results) if results else [()] * len(ColumnResult._fields):
+        try:
+            columns.append(np.array(field, dtype=np.int64))
+        except OverflowError:
+            columns.append(np.array(field, dtype=object))
+    return ColumnResult(*columns)
+
+
+def columns_from_rows(mode, rows):
+    """Parse table rows into fixed-point ``int64`` columns keyed by field name.
+
+    Cells are parsed with ``invoice_engine.to_fixed``, exactly as the
+    scalar path parses them.
+
+    Raises:
+        OverflowError: If a value does not fit ``int64``.
+    """
+    compiled = MODES[mode]
+    columns = {}
+    for position, (field, scale) in enumerate(zip(compiled.field_names, compiled.scales), 1):
+        columns[field] = np.fromiter(
+            (to_fixed(row[position], scale) if len(row) > position else 0 for row in rows),
+            dtype=np.int64,
+            count=len(rows),
+        )
+    return columns
+
+
+def calculate_columns(mode, columns):
+    """Calculate every row of ``mode`` from fixed-point columns.
+
+    Args:
+        mode (str): "Patti", "Kata" or "Barthe".
+        columns (dict): Field name (see ``invoice_engine.MODE_FIELDS``) ->
+            integer array in engine units; missing fields count as 0.
+
+    Returns:
+        ColumnResult: ``int64`` arrays of amount, quantity, packets and
+        hamali (``object`` arrays of Python integers for a column whose
+        values exceed ``int64``).
+
+    Raises:
+        ValueError: If ``mode`` is unknown or the columns differ in length.
+    """
+    calculate = _calculator(mode)
+    fields = MODES[mode].field_names
+    lengths = {len(columns[field]) for field in fields if field in columns}
+    if len(lengths) > 1:
+        raise ValueError(f"Columns for {mode} have different lengths: {sorted(lengths)}")
+    size = lengths.pop() if lengths else 0
+    values = [
+        np.asarray(columns[field], dtype=np.int64) if field in columns else np.zeros(size, dtype=np.int64)
+        for field in fields
+    ]
+    if not fits_int64(mode, values):
+        return _scalar_columns(mode, values)
+    result = calculate(*values)
+    return ColumnResult(*(np.broadcast_to(np.asarray(column, dtype=np.int64), (size,)) for column in result))
+
+
+def calculate_rows(mode, rows):
+    """Vectorised counterpart of ``invoice_engine.calculate_rows`` for text rows."""
+    try:
+        columns = columns_from_rows(mode, rows)
+    except OverflowError:
+        # A value beyond int64: parse into Python integers and stay exact
+        compiled = MODES[mode]
+        columns = [
+            np.array([to_fixed(row[position], scale) if len(row) > position else 0 for row in rows], dtype=object)
+            for position, scale in enumerate(compiled.scales, 1)
+        ]
+        return _scalar_columns(mode, columns)
+    return calculate_columns(mode, columns)
@@ -0,0 +1,203 @@
+"""Persistent item master with a prefix index for type-ahead.
+
+Items used to live in a module-level list: an item added at the counter
+was gone after a restart, and every row's dropdown had to be updated one
+by one. ``ItemMaster`` keeps them in ``item_master.json`` next to the
+ledger, each with a numeric code, English and Kannada names and optional
+default Less% and hamali. It is loaded once into:
+
+    names      the display list every dropdown reads when it opens
+    prefixes   every prefix of every word of the English and Kannada
+               names -> matching names, so "MA" is a single dict lookup
+    codes      code -> item, so typing "7" picks item 7
+
+Adding an item touches only its own index entries and rewrites the file.
+A file that cannot be parsed is renamed to ``item_master.json.corrupt-<time>``
+before the defaults are saved in its place; one that cannot be read at all
+is never written over for the rest of the session.
+"""
+import json
+import logging
+import os
+from datetime import datetime
+
+from journal import atomic_replace
+from ledger import default_documents_dir
+
+ITEM_MASTER_FILENAME = "item_master.json"
+ITEM_FIELDS = ("code", "name", "kannada", "less_percent", "hamali")
+
+
+class ItemMaster:
+    """All known items, indexed by code, name and name prefix.
+
+    Args:
+        path (str): JSON file (default: Documents/item_master.json).
+        defaults (iterable): Names to start a new master with; they get
+            codes 1, 2, ... in order.
+    """
+
+    def __init__(self, path=None, defaults=()):
+        self.path = path or os.path.join(default_documents_dir(), ITEM_MASTER_FILENAME)
+        self.names = []     # display order, shared by every dropdown
+        self._items = {}    # upper-case name -> item
+        self._codes = {}    # code -> item
+        self._prefixes = {}  # upper-case prefix -> names, in display order
+        self.writable = True  # False if the file on disk could not be read and must not be replaced
+        self._load(defaults)
+
+    def _load(self, defaults):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                records = json.load(f)["items"]
+            seeded = False
+        except FileNotFoundError:
+            records = [{"code": str(code), "name": name} for code, name in enumerate(defaults, 1)]
+            seeded = True
+        except (ValueError, KeyError, TypeError) as e:
+            # Damaged: keep it for inspection under another name, then start again from the defaults
+            records = [{"code": str(code), "name": name} for code, name in enumerate(defaults, 1)]
+            seeded = self._set_aside(e)
+        except OSError as e:
+            # Locked or not permitted: the items in it may be fine, so never save over it
+            logging.error(f"Could not read item master {self.path}, using the default items: {e}")
+            records = [{"code": str(code), "name": name} for code, name in enumerate(defaults, 1)]
+            seeded = False
+            self.writable = False
+        for record in records:
+            item = {field: str(record.get(field, "") or "").strip() for field in ITEM_FIELDS}
+            if item["name"] and item["name"].upper() not in self._items:
+                self._index(item)
+        if seeded:
+            self.save()
+
+    def _set_aside(self, error):
+        """Rename a damaged master out of the way; returns whether the path is free to save to."""
+        aside = f"{self.path}.corrupt-{datetime.now():%Y%m%d-%H%M%S}"
+        try:
+            os.replace(self.path, aside)
+        except OSError as e:
+            logging.error(f"Unreadable item master {self.path} ({error}) could not be moved aside: {e}")
+            self.writable = False
+            return False
+        logging.error(f"Unreadable item master {self.path} moved to {aside}, using the default items: {error}")
+        return True
+
+    def _index(self, item):
+        name = item["name"]
+        self._items[name.upper()] = item
+        self.names.append(name)
+        if item["code"]:
+            self._codes[item["code"]] = item
+        prefixes = set()
+        for text in (name, item["kannada"]):
+            for word in text.upper().split():
+                prefixes.update(word[:end] for end in range(1, len(word) + 1))
+            # The whole name too, so "BLACK M" still narrows down
+            text = text.upper().strip()
+            prefixes.update(text[:end] for end in range(1, len(text) + 1))
+        for prefix in prefixes:
+            self._prefixes.setdefault(prefix, []).append(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name.strip().upper() in self._items
+
+    def get(self, name):
+        """The item called ``name`` (any case), or None."""
+        return self._items.get(name.strip().upper())
+
+    def search(self, text):
+        """Names matching ``text``: the item with that code first, then prefix matches.
+
+        Returns:
+            list: Matching names in display order; all names for blank text.
+        """
+        key = text.strip().upper()
+        if not key:
+            return self.names
+        matches = []
+        by_code = self._codes.get(key)
+        if by_code is not None:
+            matches.append(by_code["name"])
+        matches.extend(name for name in self._prefixes.get(key, ()) if name not in matches)
+        return matches
+
+    def resolve(self, text):
+        """The one item ``text`` stands for: a code, a full name or a unique prefix.
+
+        Returns:
+            dict: The item, or None if ``text`` is blank, unknown or ambiguous.
+        """
+        key = text.strip().upper()
+        if not key:
+            return None
+        item = self._codes.get(key) or self._items.get(key)
+        if item is None:
+            matches = self._prefixes.get(key, ())
+            if len(matches) == 1:
+                item = self._items[matches[0].upper()]
+        return item
+
+    def add(self, name, code=None, kannada="", less_percent="", hamali=""):
+        """Add an item and save the master.
+
+        Args:
+            name (str): English name, unique ignoring case.
+            code (str): Unique code; the next free number if omitted.
+            kannada (str): Kannada name, also matched by ``search``.
+            less_percent (str): Less% filled into new Kata rows.
+            hamali (str): Hamali (or hamali rate) filled into new rows.
+
+        Returns:
+            dict: The new item.
+
+        Raises:
+            ValueError: If the name is blank, the name or code is taken, or
+                a default is not a number.
+        """
+        name = name.strip()
+        if not name:
+            raise ValueError("Item name is empty")
+        if name.upper() in self._items:
+            raise ValueError(f"Item '{name}' already exists")
+        code = str(code).strip() if code else self._next_code()
+        if code in self._codes:
+            raise ValueError(f"Item code {code} is already used by '{self._codes[code]['name']}'")
+        for label, value in (("Less%", less_percent), ("Hamali", hamali)):
+            try:
+                float(str(value).strip() or 0)
+            except ValueError:
+                raise ValueError(f"{label} default must be a number, not '{value}'") from None
+        item = {
+            "code": code,
+            "name": name,
+            "kannada": kannada.strip(),
+            "less_percent": str(less_percent).strip(),
+            "hamali": str(hamali).strip(),
+        }
+        self._index(item)
+        self.save()
+        return item
+
+    def _next_code(self):
+        numbers = [int(code) for code in self._codes if code.isdigit()]
+        return str(max(numbers, default=0) + 1)
+
+    def save(self):
+        """Write the master atomically; a failed write is logged, the items stay in memory."""
+        if not self.writable:
+            logging.error(f"Not saving item master {self.path}: it could not be read at startup")
+            return
+        data = {"items": [self._items[name.upper()] for name in self.names]}
+
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+
+        try:
+            atomic_replace(self.path, write)
+        except OSError as e:
+            logging.error(f"Could not save item master {self.path}: {e}")
@@ -0,0 +1,140 @@
+"""Crash-safe write-ahead journal for invoice saves.
+
+Every invoice is appended and fsynced to a small journal file before it is
+handed to the background writer. Once the writer has durably applied a
+batch to the store and the ledger it records a commit marker; anything
+after the last marker is replayed on the next start. Files that are
+rewritten as a whole (Excel exports) go through ``atomic_replace`` so a
+crash mid-write leaves the previous copy intact.
+"""
+import json
+import logging
+import os
+import threading
+
+JOURNAL_FILENAME = "invoice_journal.jsonl"
+
+
+def fsync_file(fh):
+    """Flush a Python file object all the way to disk."""
+    fh.flush()
+    os.fsync(fh.fileno())
+
+
+def open_for_append(path):
+    """Open ``path`` for appending text, first cutting off a torn last line.
+
+    A crash mid-append leaves a line without its newline; a record appended
+    after it would be glued onto the fragment and be unreadable too.
+    """
+    try:
+        with open(path, "r+b") as f:
+            end = pos = f.seek(0, os.SEEK_END)
+            while pos > 0:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step)
+                if pos + step == end and chunk.endswith(b"\n"):
+                    pos = end
+                    break
+                cut = chunk.rfind(b"\n")
+                if cut != -1:
+                    pos += cut + 1
+                    break
+            if pos != end:
+                logging.warning(f"Dropping {end - pos} bytes of an incomplete last line in {path}")
+                f.truncate(pos)
+                fsync_file(f)
+    except FileNotFoundError:
+        pass
+    return open(path, "a", encoding="utf-8")
+
+
+def atomic_replace(path, write_fn):
+    """Write ``path`` via a temporary file and an atomic rename.
+
+    Args:
+        path (str): Final file path.
+        write_fn (callable): Called with the temporary path; must create
+            the complete file there.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+    try:
+        write_fn(tmp_path)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class WriteAheadJournal:
+    """Append-only journal of invoices not yet applied to disk."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = self._load()
+        self._seq = max((seq for seq, _ in self._pending), default=0)
+        self._fh = open_for_append(self.path)
+
+    def _load(self):
+        """Read the journal and return ``(seq, record)`` entries after the last commit."""
+        entries = []
+        committed = 0
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn tail from a crash mid-append: that save never returned
+                    logging.warning(f"Ignoring incomplete journal entry in {self.path}")
+                    continue
+                if "commit" in entry:
+                    committed = max(committed, entry["commit"])
+                else:
+                    entries.append((entry["seq"], entry["record"]))
+        return [(seq, record) for seq, record in entries if seq > committed]
+
+    def pending(self):
+        """Entries written before the last shutdown that were never committed."""
+        with self._lock:
+            return list(self._pending)
+
+    def append(self, record):
+        """Durably record an invoice before it is applied.
+
+        Returns:
+            int: The entry's sequence number, passed to ``commit`` later.
+        """
+        with self._lock:
+            self._seq += 1
+            self._fh.write(json.dumps({"seq": self._seq, "record": record}, ensure_ascii=False) + "\n")
+            fsync_file(self._fh)
+            self._pending.append((self._seq, record))
+            return self._seq
+
+    def commit(self, seq):
+        """Mark every entry up to ``seq`` as applied.
+
+        When nothing is outstanding the journal is truncated so it stays small.
+        """
+        with self._lock:
+            self._pending = [(s, r) for s, r in self._pending if s > seq]
+            if self._pending:
+                self._fh.write(json.dumps({"commit": seq}) + "\n")
+                fsync_file(self._fh)
+            else:
+                self._fh.seek(0)
+                self._fh.truncate()
+                fsync_file(self._fh)
+
+    def close(self):
+        """Close the journal file."""
+        with self._lock:
+            self._fh.close()
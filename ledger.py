@@ -0,0 +1,358 @@
+"""Append-only daily invoice ledger.
+
+Each saved invoice is written as one JSON line to
+``Documents/Invoice_YYYY-MM-DD.jsonl``. Appending never reads or rewrites
+earlier entries, so the cost of a save stays the same however many
+invoices the day already holds. The familiar ``Invoice_YYYY-MM-DD.xlsx``
+workbook is produced from the ledger on demand (or at day close) using
+openpyxl's write-only mode.
+
+Every record carries an ``invoice_key``: ``INV-<number>`` for a numbered
+invoice, a random ``U-...`` key for an unnumbered one. Saving the same
+invoice again (preview, then Save, or a journal replay) is a no-op, and a
+changed invoice under the same key supersedes the earlier line when the
+day is read back.
+"""
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+
+from journal import atomic_replace, fsync_file, open_for_append
+
+LEDGER_PREFIX = "Invoice_"
+LEDGER_SUFFIX = ".jsonl"
+WORKBOOK_SUFFIX = ".xlsx"
+MODE_ORDER = ["Patti", "Kata", "Barthe"]
+# Last column of every exported sheet, so rows other apps append stay aligned
+INVOICE_NO_HEADER = "Invoice No"
+
+
+def default_documents_dir():
+    """Return the user's Documents folder, creating it if needed."""
+    documents_path = os.path.join(os.path.expanduser("~"), "Documents")
+    os.makedirs(documents_path, exist_ok=True)
+    return documents_path
+
+
+def today_str():
+    """Return today's date in the ledger file format (YYYY-MM-DD)."""
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+def content_hash(record):
+    """Stable hash of what an invoice says: mode, customer, rows and kata amount."""
+    try:
+        kata_amount = round(float(record.get("kata_amount") or 0), 2)
+    except (TypeError, ValueError):
+        kata_amount = 0.0
+    payload = [
+        record.get("mode", ""),
+        record.get("customer", "").strip(),
+        [[str(value).strip() for value in row] for row in record.get("rows", [])],
+        kata_amount,
+    ]
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def new_invoice_key():
+    """A fresh key for an unnumbered invoice, so two identical sales never merge."""
+    return f"U-{uuid.uuid4().hex}"
+
+
+def invoice_key(record):
+    """The record's explicit ``invoice_key``, else its invoice number, else its timestamp plus content hash.
+
+    The last only applies to records read back without a key (rows of a
+    pre-ledger workbook); new saves get a number or ``new_invoice_key``.
+    """
+    if record.get("invoice_key"):
+        return record["invoice_key"]
+    if record.get("invoice_no") is not None:
+        return f"INV-{record['invoice_no']}"
+    return f"{record['timestamp']}-{content_hash(record)}"
+
+
+class DailyLedger:
+    """Keeps the current day's ledger file open for appending."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_documents_dir()
+        self._date = None
+        self._fh = None
+        self._versions = {}  # invoice key -> content hash, for the open day
+
+    def ledger_path(self, date_str):
+        """Path of the JSON-lines ledger for ``date_str``."""
+        return os.path.join(self.directory, f"{LEDGER_PREFIX}{date_str}{LEDGER_SUFFIX}")
+
+    def workbook_path(self, date_str):
+        """Path of the exported Excel workbook for ``date_str``."""
+        return os.path.join(self.directory, f"{LEDGER_PREFIX}{date_str}{WORKBOOK_SUFFIX}")
+
+    def _open(self, date_str):
+        """Return the append handle for ``date_str``, rolling over at midnight."""
+        if self._fh is not None and self._date == date_str:
+            return self._fh
+        self.close()
+        path = self.ledger_path(date_str)
+        if not os.path.exists(path):
+            self._seed_from_workbook(date_str)
+        self._fh = open_for_append(path)
+        # One pass per day per session to learn which invoices it already holds
+        self._versions = {invoice_key(r): content_hash(r) for r in self._read_lines(date_str)}
+        self._date = date_str
+        return self._fh
+
+    def append(self, record):
+        """Append one invoice record.
+
+        Args:
+            record (dict): Invoice with ``timestamp``, ``customer``, ``mode``,
+                ``headers`` and ``rows`` keys.
+        """
+        self.append_many([record])
+
+    def append_many(self, records):
+        """Append several invoice records with a single flush per day file.
+
+        Records whose key and content the day already holds are skipped.
+
+        Returns:
+            tuple: ``(written, replaced)`` - the records actually appended
+            and how many of them supersede an earlier version.
+        """
+        written = []
+        replaced = 0
+        for date_str, group in group_by_day(records):
+            fh = self._open(date_str)
+            versions = {}
+            fresh = []
+            for record in group:
+                key = invoice_key(record)
+                digest = content_hash(record)
+                previous = versions.get(key, self._versions.get(key))
+                if previous == digest:
+                    continue
+                replaced += previous is not None
+                versions[key] = digest
+                fresh.append(record)
+            if fresh:
+                fh.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in fresh))
+                fh.flush()
+                self._versions.update(versions)
+                written.extend(fresh)
+        return written, replaced
+
+    def sync(self):
+        """Force appended records to disk."""
+        if self._fh is not None:
+            fsync_file(self._fh)
+
+    def size(self, date_str):
+        """Bytes in ``date_str``'s ledger file, 0 if the day has none.
+
+        A day that so far only has a pre-ledger workbook is seeded from it
+        first, so the size covers every invoice ``read`` would return.
+        """
+        path = self.ledger_path(date_str)
+        if not os.path.exists(path):
+            self._seed_from_workbook(date_str)
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return 0
+
+    def read(self, date_str):
+        """Return the invoices stored for ``date_str`` in save order.
+
+        Where an invoice was saved more than once only its latest version
+        is returned, in the position of the first.
+        """
+        latest = {}
+        for record in self._read_lines(date_str):
+            latest[invoice_key(record)] = record
+        return list(latest.values())
+
+    def _read_lines(self, date_str):
+        """Yield every record line of ``date_str``'s ledger file."""
+        path = self.ledger_path(date_str)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted write; skip it
+                    logging.warning(f"Skipping unreadable ledger line {line_no} in {path}")
+
+    def export_xlsx(self, date_str=None, path=None):
+        """Write the day's ledger out as an Excel workbook.
+
+        One sheet per mode with a ``Timestamp, Customer`` + headers row,
+        the same layout ``save_to_excel`` has always produced, plus a
+        trailing ``Invoice No`` column. Invoices
+        that other front-ends appended straight to the workbook are kept.
+
+        Args:
+            date_str (str): Day to export, defaults to today.
+            path (str): Target file, defaults to ``Invoice_<date>.xlsx``.
+
+        Returns:
+            str: The path written, or None if the day has no invoices.
+        """
+        from openpyxl import Workbook
+
+        date_str = date_str or today_str()
+        path = path or self.workbook_path(date_str)
+
+        records = self.read(date_str)
+        records.extend(self._workbook_only_records(date_str, path, records))
+        records.sort(key=lambda r: r.get("timestamp", ""))
+
+        sheets = {}
+        for record in records:
+            mode = record.get("mode") or "Invoice"
+            if mode not in sheets:
+                sheets[mode] = [["Timestamp", "Customer"] + list(record.get("headers", [])) + [INVOICE_NO_HEADER]]
+            width = len(sheets[mode][0]) - 3
+            invoice_no = record.get("invoice_no", "")
+            for row in record.get("rows", []):
+                cells = list(row)[:width]
+                cells += [""] * (width - len(cells))
+                sheets[mode].append([record.get("timestamp", ""), record.get("customer", "")] + cells + [invoice_no])
+
+        if not sheets:
+            return None
+
+        wb = Workbook(write_only=True)
+        ordered = [m for m in MODE_ORDER if m in sheets] + [m for m in sheets if m not in MODE_ORDER]
+        for mode in ordered:
+            ws = wb.create_sheet(title=mode)
+            for row in sheets[mode]:
+                ws.append(row)
+        # Never leave a half-written workbook in place of the previous export
+        atomic_replace(path, wb.save)
+        logging.info(f"Exported ledger for {date_str} to {path}")
+        return path
+
+    def _workbook_only_records(self, date_str, path, records):
+        """Invoices present in the existing workbook but not in the ledger.
+
+        Numbered rows are matched by invoice number, since a re-saved
+        invoice keeps its number but gets a new timestamp; rows without a
+        number fall back to timestamp, customer and mode.
+        """
+        if not os.path.exists(path):
+            return []
+        try:
+            existing = records_from_workbook(path)
+        except Exception as e:
+            logging.error(f"Could not read existing workbook {path}: {e}")
+            return []
+        numbers = {r["invoice_no"] for r in records if r.get("invoice_no") is not None}
+        known = {(r.get("timestamp"), r.get("customer"), r.get("mode")) for r in records}
+        return [
+            r for r in existing
+            if (r["invoice_no"] not in numbers if r.get("invoice_no") is not None
+                else (r["timestamp"], r["customer"], r["mode"]) not in known)
+        ]
+
+    def _seed_from_workbook(self, date_str):
+        """Carry invoices from a pre-ledger workbook into a new ledger file.
+
+        Days that were started before the ledger existed only have the
+        ``.xlsx``; copy its rows across once so a later export does not
+        drop them.
+        """
+        workbook_path = self.workbook_path(date_str)
+        if not os.path.exists(workbook_path):
+            return
+        try:
+            records = records_from_workbook(workbook_path)
+        except Exception as e:
+            logging.error(f"Could not read existing workbook {workbook_path}: {e}")
+            return
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        atomic_replace(self.ledger_path(date_str), write)
+        logging.info(f"Seeded ledger for {date_str} with {len(records)} invoices from {workbook_path}")
+
+    def close(self):
+        """Close the open ledger file, if any."""
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+            self._date = None
+            self._versions = {}
+
+
+def group_by_day(records):
+    """Split records into runs that share a save date, keeping their order."""
+    groups = []
+    for record in records:
+        date_str = record["timestamp"][:10]
+        if groups and groups[-1][0] == date_str:
+            groups[-1][1].append(record)
+        else:
+            groups.append((date_str, [record]))
+    return groups
+
+
+def records_from_workbook(path):
+    """Read a ``Invoice_<date>.xlsx`` workbook back into invoice records.
+
+    Consecutive rows sharing the same timestamp, customer and invoice
+    number on a mode sheet are grouped into one invoice.
+    """
+    from openpyxl import load_workbook
+
+    records = []
+    wb = load_workbook(path, read_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header or header[:2] != ("Timestamp", "Customer"):
+                continue
+            headers = ["" if h is None else str(h) for h in header[2:]]
+            numbered = bool(headers) and headers[-1] == INVOICE_NO_HEADER
+            if numbered:
+                headers.pop()
+            current = None
+            for row in rows:
+                if not row or row[0] is None:
+                    continue
+                timestamp = str(row[0])
+                customer = "" if row[1] is None else str(row[1])
+                values = ["" if v is None else str(v) for v in row[2:]]
+                invoice_no = None
+                if numbered:
+                    number = row[2 + len(headers)] if len(row) > 2 + len(headers) else None
+                    values = values[:len(headers)]
+                    invoice_no = int(number) if isinstance(number, (int, float)) else None
+                if current is None or (current["timestamp"], current["customer"], current.get("invoice_no")) != (
+                        timestamp, customer, invoice_no):
+                    current = {
+                        "timestamp": timestamp,
+                        "customer": customer,
+                        "mode": ws.title,
+                        "headers": headers,
+                        "rows": [],
+                    }
+                    if invoice_no is not None:
+                        current["invoice_no"] = invoice_no
+                    records.append(current)
+                current["rows"].append(values)
+    finally:
+        wb.close()
+    return records
@@ -9,13 +9,20 @@ from PySide6.QtWidgets import (
     QTableWidgetItem, QHeaderView, QMessageBox, QRadioButton,
     QButtonGroup, QSpacerItem, QSizePolicy, QDialog, QTextEdit
 )
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, QStringListModel
 from PySide6.QtGui import QPalette, QColor
 from constants import *
-from openpyxl import Workbook, load_workbook
 import win32print
 import win32api
 
+# The shared ledger lives in the repository root, next to final.py
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+from ledger import DailyLedger, new_invoice_key
+# Same item master as the Tk app, so items added in either app show in both
+from item_master import ItemMaster
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -35,6 +42,11 @@ class InvoiceWindow(QMainWindow):
         self.setWindowTitle("G.V. Mahant Brothers - Invoice")
         self.setMinimumSize(1200, 800)
         self.load_config()
+        # One model behind every row's item combo: an added item shows in all of them at once
+        self.item_master = ItemMaster(defaults=ITEM_LIST)
+        self.item_model = QStringListModel(list(self.item_master.names))
+        # Saves append to the day's ledger; the workbook is written on Export and on exit
+        self.ledger = DailyLedger()
         self.setup_ui()
 
     def clear_rows(self):
@@ -60,6 +72,27 @@ class InvoiceWindow(QMainWindow):
         dialog = ItemManagerDialog(self)
         dialog.exec()
 
+    def add_item(self, name, **fields):
+        """Add an item to the shared model and the item master file.
+
+        Args:
+            name (str): Item name.
+            **fields: ``code``, ``kannada``, ``less_percent`` and ``hamali``
+                for ``ItemMaster.add``.
+
+        Returns:
+            dict: The new item.
+
+        Raises:
+            ValueError: If the name is empty or taken (ignoring case), the
+                code is taken, or a default is not a number.
+        """
+        item = self.item_master.add(name, **fields)
+        row = self.item_model.rowCount()
+        self.item_model.insertRows(row, 1)
+        self.item_model.setData(self.item_model.index(row), item["name"])
+        return item
+
     def setup_ui(self):
         # Create central widget and main layout
         central_widget = QWidget()
@@ -265,6 +298,8 @@ class InvoiceWindow(QMainWindow):
         clear_btn.setObjectName("clear")
         save_btn = QPushButton("Save")
         save_btn.setObjectName("save")
+        export_btn = QPushButton("Export Excel")
+        export_btn.setObjectName("save")
         print_btn = QPushButton("Print")
         print_btn.setObjectName("print")
         manage_items_btn = QPushButton("Manage Items")
@@ -275,6 +310,7 @@ class InvoiceWindow(QMainWindow):
         button_layout.addWidget(add_row_btn)
         button_layout.addWidget(clear_btn)
         button_layout.addWidget(save_btn)
+        button_layout.addWidget(export_btn)
         button_layout.addWidget(print_btn)
         
         # Connect button signals
@@ -282,6 +318,7 @@ class InvoiceWindow(QMainWindow):
         add_row_btn.clicked.connect(self.add_row)
         clear_btn.clicked.connect(self.clear_rows)
         save_btn.clicked.connect(self.save_to_excel)
+        export_btn.clicked.connect(self.export_excel)
         print_btn.clicked.connect(self.show_print_preview)
         
         # Total section
@@ -356,7 +393,10 @@ class InvoiceWindow(QMainWindow):
                 outline: 0;
             }
         """)
-        item_combo.addItems(ITEM_LIST)
+        # Shared model; typing completes against it by prefix
+        item_combo.setModel(self.item_model)
+        item_combo.setEditable(True)
+        item_combo.setInsertPolicy(QComboBox.NoInsert)
         item_combo.currentTextChanged.connect(self.update_amounts)
         item_combo.setFont(QFont("Segoe UI", 11))
         item_combo.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
@@ -620,86 +660,88 @@ class InvoiceWindow(QMainWindow):
 
     def save_to_excel(self):
             try:
-                # Get user's Documents directory
-                home_dir = os.path.expanduser("~")
-                documents_path = os.path.join(home_dir, "Documents")
-                os.makedirs(documents_path, exist_ok=True)
-    
-                # Create filename based on current date
-                date_str = datetime.now().strftime('%Y-%m-%d')
-                base_filename = f"Invoice_{date_str}.xlsx"
-                full_save_path = os.path.join(documents_path, base_filename)
-    
                 # Get invoice data
                 customer = self.customer_entry.text().strip() or "Unknown Customer"
                 mode = self.current_mode
     
-                # Get headers
+                # Get headers (the last column holds the delete button)
                 headers = [self.table.horizontalHeaderItem(i).text() 
-                          for i in range(self.table.columnCount())]
+                          for i in range(self.table.columnCount() - 1)]
     
-                # Get row data
+                # Get row data; entries and the amount label sit inside container widgets
                 data_rows = []
                 for row in range(self.table.rowCount()):
                     row_values = []
                     item_combo = self.table.cellWidget(row, 0)
                     if item_combo and item_combo.currentText().strip():
                         row_values.append(item_combo.currentText())
-                        for col in range(1, self.table.columnCount()):
+                        for col in range(1, self.table.columnCount() - 1):
                             widget = self.table.cellWidget(row, col)
-                            if isinstance(widget, QLineEdit):
-                                row_values.append(widget.text())
-                            elif isinstance(widget, QLabel):
-                                row_values.append(widget.text().replace('₹', ''))
+                            entry = widget.findChild(QLineEdit) if widget else None
+                            label = widget.findChild(QLabel) if widget else None
+                            if entry is not None:
+                                row_values.append(entry.text())
+                            elif label is not None:
+                                row_values.append(label.text().replace('₹', ''))
+                            else:
+                                row_values.append("")
                         data_rows.append(row_values)
     
                 if not data_rows:
                     QMessageBox.warning(self, "No Data", "No data entered to save.")
                     return
     
-                # Excel writing logic
+                # One JSON line appended to the day's ledger; earlier invoices are never reread
+                record = {
+                    "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    "customer": customer,
+                    "mode": mode,
+                    "headers": headers,
+                    "rows": data_rows,
+                    "invoice_key": new_invoice_key(),
+                }
+                if mode == "Kata" and hasattr(self, 'kata_amount_entry'):
+                    record["kata_amount"] = validate_float(self.kata_amount_entry.text())
                 try:
-                    if os.path.exists(full_save_path):
-                        wb = load_workbook(full_save_path)
-                    else:
-                        wb = Workbook()
-    
-                    # Get or create sheet
-                    if mode in wb.sheetnames:
-                        ws = wb[mode]
-                    else:
-                        if len(wb.sheetnames) > 0:
-                            ws = wb.create_sheet(title=mode)
-                        else:
-                            ws = wb.active
-                            ws.title = mode
-    
-                    # Clear existing content
-                    ws.delete_rows(1, ws.max_row)
-    
-                    # Write headers and data
-                    ws.append(["Timestamp", "Customer"] + headers)
-                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    for row in data_rows:
-                        ws.append([timestamp, customer] + row)
-    
-                    # Save workbook
-                    wb.save(full_save_path)
-                    QMessageBox.information(self, "Saved", 
-                        f"Invoice data saved to:\n{full_save_path}\n(Sheet: {mode})")
-    
-                except PermissionError:
-                    QMessageBox.critical(self, "Permission Error",
-                        f"Cannot save '{base_filename}'.\n" \
-                        f"The file might be open in Excel.\n\nLocation: {documents_path}")
+                    self.ledger.append(record)
+                    self.ledger.sync()
+                    QMessageBox.information(self, "Saved",
+                        f"Invoice saved to:\n{self.ledger.ledger_path(record['timestamp'][:10])}\n"
+                        f"Use Export Excel for the day's workbook.")
                 except Exception as e:
-                    QMessageBox.critical(self, "Save Error",
-                        f"Error saving Excel file to:\n{full_save_path}\n\nError: {str(e)}")
+                    logging.exception("Saving to the ledger failed")
+                    QMessageBox.critical(self, "Save Error", f"Error saving invoice:\n\n{str(e)}")
     
             except Exception as e:
                 QMessageBox.critical(self, "Error",
                     f"Unexpected error during save operation: {str(e)}")
     
+    def export_excel(self):
+        """Write today's ledger out as Invoice_<date>.xlsx."""
+        try:
+            path = self.ledger.export_xlsx()
+        except PermissionError:
+            QMessageBox.critical(self, "Permission Error",
+                "Cannot write today's Excel file.\nThe file might be open in Excel.")
+            return
+        except Exception as e:
+            logging.exception("Excel export failed")
+            QMessageBox.critical(self, "Export Error", f"Error exporting Excel file:\n\n{str(e)}")
+            return
+        if path:
+            QMessageBox.information(self, "Exported", f"Invoices exported to:\n{path}")
+        else:
+            QMessageBox.information(self, "Exported", "No invoices saved today.")
+
+    def closeEvent(self, event):
+        """Export the day's workbook before closing."""
+        try:
+            self.ledger.export_xlsx()
+        except Exception as e:
+            logging.error(f"Could not export the day's workbook on exit: {e}")
+        self.ledger.close()
+        super().closeEvent(event)
+
     def delete_row(self, row):
         self.table.removeRow(row)
         self.update_amounts()
@@ -752,7 +794,7 @@ class ItemManagerDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("Manage Items")
         self.setModal(True)
-        self.resize(300, 200)
+        self.resize(300, 360)
         self.setStyleSheet("""
             QDialog { background-color: #ffffff; }
             QLineEdit, QPushButton {
@@ -769,18 +811,35 @@ class ItemManagerDialog(QDialog):
         layout = QVBoxLayout(self)
         self.input = QLineEdit()
         self.input.setPlaceholderText("Enter new item")
+        self.code_input = QLineEdit()
+        self.code_input.setPlaceholderText("Code (blank for next number)")
+        self.kannada_input = QLineEdit()
+        self.kannada_input.setPlaceholderText("Kannada name")
+        self.less_input = QLineEdit()
+        self.less_input.setPlaceholderText("Default Less %")
+        self.hamali_input = QLineEdit()
+        self.hamali_input.setPlaceholderText("Default hamali")
         self.add_button = QPushButton("Add Item")
         self.add_button.clicked.connect(self.add_item)
-        layout.addWidget(self.input)
-        layout.addWidget(self.add_button)
+        for widget in (self.input, self.code_input, self.kannada_input,
+                       self.less_input, self.hamali_input, self.add_button):
+            layout.addWidget(widget)
 
     def add_item(self):
-        new_item = self.input.text().strip()
-        if new_item and new_item not in ITEM_LIST:
-            ITEM_LIST.append(new_item)
-            QMessageBox.information(self, "Success", f"'{new_item}' added.")
-        else:
-            QMessageBox.warning(self, "Invalid", "Item already exists or is empty.")
+        try:
+            item = self.parent().add_item(
+                self.input.text(),
+                code=self.code_input.text(),
+                kannada=self.kannada_input.text(),
+                less_percent=self.less_input.text(),
+                hamali=self.hamali_input.text(),
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid", str(e))
+            return
+        QMessageBox.information(self, "Success", f"'{item['name']}' added (code {item['code']}).")
+        for widget in (self.input, self.code_input, self.kannada_input, self.less_input, self.hamali_input):
+            widget.clear()
 
 
 class PrintPreviewDialog(QDialog):
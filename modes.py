@@ -0,0 +1,67 @@
+"""Declarative definitions of the invoice modes.
+
+Each mode lists its input fields (in table order, after Item) and the
+rules that turn them into an amount. ``invoice_engine`` builds every
+spec once at import into a row calculator plus the table headers and
+receipt layout, so a rule change or a new mode is an edit to this table.
+
+Field keys:
+    name: Identifier used by the rules below.
+    header: Table / Excel column header.
+    print: Short receipt header; ``width`` is its receipt column width.
+    unit: "count", "weight" (kg), "money" (rupees) or "percent".
+
+Mode keys:
+    rate: Field holding the price per kg.
+    weight: How the charged weight is built: start ``from`` a field,
+        optionally multiply by a count field (``times``), deduct a Less%
+        field (``less_percent``) and add an adjustment field (``plus``).
+    hamali: ``rate`` field and what it is charged ``on``: a count field
+        (per packet), "packets" (whole ``packet_weight`` kg packets of the
+        gross weight), "weight" (per kg of final weight) or "row" (flat).
+    item_width, amount_width: Receipt column widths for Item and Amount.
+"""
+
+MODE_SPECS = {
+    "Patti": {
+        "fields": [
+            {"name": "packet", "header": "Packet", "print": "Pkt", "width": 4, "unit": "count"},
+            {"name": "quantity", "header": "Quantity", "print": "Qty", "width": 5, "unit": "weight"},
+            {"name": "rate", "header": "Rate", "print": "Rate", "width": 7, "unit": "money"},
+            {"name": "hamali", "header": "Hamali", "print": "Ham", "width": 4, "unit": "money"},
+        ],
+        "rate": "rate",
+        "weight": {"from": "quantity"},
+        "hamali": {"rate": "hamali", "on": "packet"},
+        "item_width": 8,
+        "amount_width": 6,
+    },
+    "Kata": {
+        "fields": [
+            {"name": "net_weight", "header": "Net Wt", "print": "Net", "width": 4, "unit": "weight"},
+            {"name": "less_percent", "header": "Less%", "print": "Les", "width": 4, "unit": "percent"},
+            {"name": "rate", "header": "Rate", "print": "Rate", "width": 7, "unit": "money"},
+            {"name": "hamali_rate", "header": "Hamali Rate", "print": "Ham", "width": 4, "unit": "money"},
+        ],
+        "rate": "rate",
+        "weight": {"from": "net_weight", "less_percent": "less_percent"},
+        # The PySide6 apps charge Kata hamali per kg of final weight ("on": "weight")
+        "hamali": {"rate": "hamali_rate", "on": "packets", "packet_weight": 60},
+        "item_width": 8,
+        "amount_width": 6,
+    },
+    "Barthe": {
+        "fields": [
+            {"name": "packet", "header": "Packet", "print": "Pkt", "width": 4, "unit": "count"},
+            {"name": "weight", "header": "Weight", "print": "Wt", "width": 4, "unit": "weight"},
+            {"name": "adjustment", "header": "+/-", "print": "+/-", "width": 4, "unit": "weight"},
+            {"name": "rate", "header": "Rate", "print": "Rate", "width": 6, "unit": "money"},
+            {"name": "hamali", "header": "Hamali", "print": "Ham", "width": 4, "unit": "money"},
+        ],
+        "rate": "rate",
+        "weight": {"from": "weight", "times": "packet", "plus": "adjustment"},
+        "hamali": {"rate": "hamali", "on": "packet"},
+        "item_width": 7,
+        "amount_width": 6,
+    },
+}
@@ -0,0 +1,435 @@
+"""Background persistence for invoice saves.
+
+The Tk mainloop must never wait on disk. ``SaveWorker`` owns the ledger
+and the SQLite store on its own thread; the UI hands it immutable
+``InvoiceSnapshot`` objects through a bounded queue and picks up the
+outcome later with ``poll_results``. Saves that arrive back to back are
+written as one batch: one transaction and one ledger flush.
+
+Each snapshot is fsynced to the write-ahead journal before it is queued,
+so a crash between Save and the batched flush loses nothing; the worker
+replays uncommitted journal entries when it starts.
+
+If a target is locked (the day's workbook open in Excel, the database
+busy on another counter) the work stays parked in the journal and the
+worker retries it in one batch every ``RETRY_INTERVAL`` seconds. The UI
+sees a ``pending`` count instead of an error dialog. An invoice a target
+rejects for any other reason is moved to ``invoice_quarantine.jsonl`` and
+reported once, so it cannot hold up the saves behind it.
+
+After every ledger flush the worker also folds the new invoices into the
+day's ``DailyTotals`` file, so a Z-report never has to re-read the day.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from typing import NamedTuple
+
+from daily_totals import DailyTotals
+from invoice_store import InvoiceStore
+from journal import JOURNAL_FILENAME, WriteAheadJournal, fsync_file
+from ledger import DailyLedger, group_by_day, invoice_key, new_invoice_key
+
+SAVE_QUEUE_SIZE = 64
+MAX_BATCH = 32
+RETRY_INTERVAL = 5  # seconds between attempts while something is locked
+QUARANTINE_FILENAME = "invoice_quarantine.jsonl"
+
+# SQLite result codes that clear up on their own once another connection lets go
+RETRYABLE_SQLITE_ERRORS = ("SQLITE_BUSY", "SQLITE_LOCKED")
+
+_STOP = object()
+
+
+def is_retryable(error):
+    """Whether ``error`` is a locked file that another program will let go of.
+
+    Only busy/locked SQLite errors qualify; "disk I/O error", "no such
+    column" or a full disk will not go away by waiting, so those invoices
+    are quarantined instead of being kept pending for ever.
+    """
+    if isinstance(error, PermissionError):
+        return True
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    name = getattr(error, "sqlite_errorname", None)  # Python 3.11+
+    if name:
+        return name.startswith(RETRYABLE_SQLITE_ERRORS)
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+class InvoiceSnapshot(NamedTuple):
+    """Frozen copy of an invoice taken on the UI thread."""
+    timestamp: str
+    customer: str
+    mode: str
+    headers: tuple
+    rows: tuple
+    kata_amount: float = 0.0
+    invoice_key: str = ""
+    invoice_no: int = None
+
+    @classmethod
+    def from_record(cls, record):
+        """Build a snapshot from a ``save_to_excel`` record dict.
+
+        A record with neither a key nor a number gets a new random key here,
+        once, so its journal replay stays idempotent without merging it
+        with an identical sale.
+        """
+        key = record.get("invoice_key") or ""
+        if not key and record.get("invoice_no") is None:
+            key = new_invoice_key()
+        return cls(
+            timestamp=record["timestamp"],
+            customer=record["customer"],
+            mode=record["mode"],
+            headers=tuple(record["headers"]),
+            rows=tuple(tuple(row) for row in record["rows"]),
+            kata_amount=record.get("kata_amount", 0.0),
+            invoice_key=key,
+            invoice_no=record.get("invoice_no"),
+        )
+
+    def as_record(self):
+        """Return the plain dict layout the ledger and store expect."""
+        record = {
+            "timestamp": self.timestamp,
+            "customer": self.customer,
+            "mode": self.mode,
+            "headers": list(self.headers),
+            "rows": [list(row) for row in self.rows],
+        }
+        if self.mode == "Kata":
+            record["kata_amount"] = self.kata_amount
+        if self.invoice_no is not None:
+            record["invoice_no"] = self.invoice_no
+        record["invoice_key"] = self.invoice_key or invoice_key(record)
+        return record
+
+
+class SaveWorker(threading.Thread):
+    """Dedicated writer thread for the ledger and the invoice store."""
+
+    def __init__(self, store_path=None, ledger_dir=None, maxsize=SAVE_QUEUE_SIZE):
+        super().__init__(name="invoice-save-worker", daemon=True)
+        self.store_path = store_path
+        self.ledger = DailyLedger(ledger_dir)
+        self.journal = WriteAheadJournal(os.path.join(self.ledger.directory, JOURNAL_FILENAME))
+        # Taken before any submit so replay never repeats a queued save
+        self._replay = self.journal.pending()
+        self.store = None
+        self.store_failed = False  # set if the worker could not open the store and ended
+        self._requests = queue.Queue(maxsize=maxsize)
+        self._results = queue.Queue()
+        # Journalled work not yet applied, kept per target so a retry never
+        # writes the same invoice twice to the one that already succeeded
+        self._unstored = []
+        self._unledgered = []
+        self._exports = []
+        self._reports = []
+        self._totals = {}  # date -> DailyTotals verified against the ledger
+        self._quarantined = set()  # seqs set aside during the current flush
+        self._committed = 0
+        self._last_error = None
+
+    @property
+    def pending_count(self):
+        """Number of invoices and exports waiting on a locked file."""
+        seqs = {seq for seq, _ in self._unstored} | {seq for seq, _ in self._unledgered}
+        return len(seqs) + len(self._exports)
+
+    def submit(self, snapshot):
+        """Journal a snapshot and queue it for saving.
+
+        Returns once the snapshot is durable in the journal; the store and
+        ledger are updated later on the worker thread.
+
+        Raises:
+            queue.Full: If the writer has fallen ``maxsize`` saves behind.
+        """
+        # Only the UI thread submits, so checking first is race free and
+        # keeps a rejected save out of the journal
+        if self._requests.full():
+            raise queue.Full
+        seq = self.journal.append(snapshot.as_record())
+        if not self.store_failed:
+            self._requests.put_nowait(("save", (seq, snapshot)))
+        else:
+            # Nothing would drain the queue; the next session replays the journal
+            self._report_error("The invoice database could not be opened; saves are kept "
+                               "in the journal and written on the next start.")
+
+    def request_export(self, date_str, block=False, timeout=None):
+        """Queue an Excel export of ``date_str``'s ledger.
+
+        Raises:
+            queue.Full: If the queue is full (after ``timeout`` when blocking).
+        """
+        self._requests.put(("export", date_str), block=block, timeout=timeout)
+
+    def request_z_report(self, date_str):
+        """Queue a Z-report of ``date_str``; the lines arrive as a ``z_report`` result.
+
+        Raises:
+            queue.Full: If the queue is full.
+        """
+        self._requests.put_nowait(("z_report", date_str))
+
+    def stop(self, timeout=None):
+        """Finish queued work, close files and end the thread.
+
+        Returns:
+            bool: True if the thread has ended; False if it was still busy
+            after ``timeout`` (its unfinished saves stay in the journal).
+        """
+        if self.is_alive():
+            try:
+                self._requests.put(_STOP, timeout=timeout)
+            except queue.Full:
+                logging.error("Save worker is not taking requests; unsaved work stays in the journal")
+                return False
+            self.join(timeout)
+        return not self.is_alive()
+
+    def poll_results(self):
+        """Return the outcomes reported since the last poll.
+
+        Each outcome is a ``(kind, detail)`` tuple where kind is ``saved``
+        (detail: invoice count), ``pending`` (detail: items waiting to be
+        retried), ``exported`` (detail: path), ``z_report`` (detail:
+        printable lines) or ``error`` (detail: message). Call this from the UI thread.
+        """
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def run(self):
+        try:
+            # SQLite connections stay on the thread that opened them
+            self.store = InvoiceStore(self.store_path)
+        except Exception as e:
+            logging.exception("Could not open the invoice store")
+            self._report_error(f"Cannot open the invoice database: {e}")
+            self.store_failed = True
+            # The journal stays open: the UI thread still appends to it
+            self.ledger.close()
+            return
+        try:
+            replay = [(seq, InvoiceSnapshot.from_record(record)) for seq, record in self._replay]
+            if replay:
+                logging.info(f"Replaying {len(replay)} journalled invoice(s) from the last session")
+                self._flush(replay)
+            running = True
+            while running:
+                batch = []
+                try:
+                    # Wake up periodically only while something is waiting to retry
+                    request = self._requests.get(timeout=RETRY_INTERVAL if self.pending_count else None)
+                except queue.Empty:
+                    self._flush([])
+                    continue
+                # Drain whatever queued up behind the first request into one flush
+                while True:
+                    if request is _STOP:
+                        running = False
+                        break
+                    kind, payload = request
+                    if kind == "save":
+                        batch.append(payload)
+                        if len(batch) >= MAX_BATCH:
+                            break
+                    elif kind == "z_report":
+                        self._reports.append(payload)
+                    elif payload not in self._exports:
+                        self._exports.append(payload)
+                    try:
+                        request = self._requests.get_nowait()
+                    except queue.Empty:
+                        break
+                self._flush(batch)
+        finally:
+            self.ledger.close()
+            self.store.close()
+            self.journal.close()
+
+    def _flush(self, batch):
+        """Apply new saves plus anything parked from earlier attempts."""
+        self._unstored.extend(batch)
+        self._unledgered.extend(batch)
+        saved = {seq for seq, _ in self._unstored} | {seq for seq, _ in self._unledgered}
+        blocked = None
+
+        if self._unstored:
+            self._unstored, error = self._apply(self._unstored, self.store.save_many, "invoice store")
+            blocked = blocked or error
+
+        if self._unledgered:
+            self._unledgered, error = self._apply(self._unledgered, self._write_ledger, "ledger")
+            blocked = blocked or error
+
+        self._commit_journal(max(saved, default=0))
+        unfinished = {seq for seq, _ in self._unstored} | {seq for seq, _ in self._unledgered}
+        done = len(saved - unfinished - self._quarantined)
+        self._quarantined.clear()
+        if done:
+            logging.info(f"Saved {done} invoice(s) in one flush")
+            self._results.put(("saved", done))
+
+        # Exports and reports read the ledger, so they wait until it has every invoice
+        if not self._unledgered:
+            for date_str in self._reports:
+                self._results.put(("z_report", self._day_totals(date_str).z_report_lines()))
+            self._reports = []
+            for date_str in list(self._exports):
+                if self._export(date_str):
+                    self._exports.remove(date_str)
+                else:
+                    blocked = blocked or PermissionError(f"Excel file for {date_str} is locked")
+
+        if self.pending_count:
+            logging.warning(f"{self.pending_count} item(s) waiting to be written, retrying: {blocked}")
+            self._results.put(("pending", self.pending_count))
+        else:
+            self._last_error = None
+
+    def _apply(self, pending, write, target):
+        """Write ``pending`` to one target with ``write(records)``.
+
+        Only locked-file errors keep invoices waiting. Any other failure of
+        the batch is narrowed down by writing one invoice at a time, and the
+        invoices that still fail are quarantined, so one bad record cannot
+        hold back every later save or the journal.
+
+        Returns:
+            tuple: ``(still_pending, error)`` - the invoices to retry and the
+            locked-file error that kept them, if any.
+        """
+        try:
+            write([snapshot.as_record() for _, snapshot in pending])
+            return [], None
+        except Exception as e:
+            if is_retryable(e):
+                return pending, e
+            logging.exception(f"Writing {len(pending)} invoice(s) to the {target} failed, trying one at a time")
+        parked = []
+        blocked = None
+        for seq, snapshot in pending:
+            try:
+                write([snapshot.as_record()])
+            except Exception as e:
+                if is_retryable(e):
+                    parked.append((seq, snapshot))
+                    blocked = e
+                else:
+                    self._quarantine(seq, snapshot, target, e)
+        return parked, blocked
+
+    def _write_ledger(self, records):
+        # Check each day's totals against the ledger before the append changes its size
+        verified = {date_str: self._day_totals(date_str) for date_str, _ in group_by_day(records)}
+        written, replaced = self.ledger.append_many(records)
+        self.ledger.sync()
+        self._update_totals(written, verified, rebuild=bool(replaced))
+
+    def _quarantine(self, seq, snapshot, target, error):
+        """Set an invoice that cannot be written aside in the quarantine file."""
+        path = os.path.join(self.ledger.directory, QUARANTINE_FILENAME)
+        entry = {
+            "seq": seq,
+            "target": target,
+            "error": str(error),
+            "quarantined": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "snapshot": snapshot._asdict(),
+        }
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                fsync_file(f)
+        except OSError as e:
+            logging.error(f"Could not write invoice {seq} to {path}: {e}")
+        logging.error(f"Invoice {seq} ({snapshot.customer}, {snapshot.timestamp}) quarantined "
+                      f"after the {target} rejected it: {error}")
+        self._quarantined.add(seq)
+        self._report_error(f"An invoice could not be saved to the {target} and was set aside in {path}: {error}")
+
+    def _report_error(self, message):
+        """Tell the UI about a failure once, not on every retry."""
+        if message != self._last_error:
+            self._last_error = message
+            self._results.put(("error", message))
+
+    def _commit_journal(self, highest):
+        """Retire journal entries that every target now holds."""
+        outstanding = [seq for seq, _ in self._unstored] + [seq for seq, _ in self._unledgered]
+        upto = min(outstanding) - 1 if outstanding else highest
+        if upto > self._committed:
+            self.journal.commit(upto)
+            self._committed = upto
+
+    def _day_totals(self, date_str):
+        """Totals for ``date_str``, rebuilt from the ledger if they disagree with it.
+
+        The ledger size the totals recorded is compared with the file's
+        size on every call (one ``stat``), so invoices the other apps
+        appended to the same ledger are picked up; only a mismatch reads
+        the day back.
+        """
+        totals = self._totals.get(date_str)
+        if totals is None:
+            totals = DailyTotals.load(self.ledger.directory, date_str)
+        size = self.ledger.size(date_str)
+        if totals.ledger_size != size:
+            logging.warning(f"Totals for {date_str} do not match the ledger, rebuilding")
+            totals.rebuild(self.ledger.read(date_str), size)
+        # Only the day being worked on needs to stay in memory
+        self._totals = {date_str: totals}
+        return totals
+
+    def _update_totals(self, records, verified, rebuild=False):
+        """Fold freshly ledgered invoices into their day's totals file.
+
+        Args:
+            records (list): Records just appended to the ledger.
+            verified (dict): Date -> totals checked against the ledger
+                before the append.
+            rebuild (bool): An invoice replaced an earlier version of itself,
+                whose figures are in the totals, so recompute the day.
+        """
+        for date_str, group in group_by_day(records):
+            if rebuild:
+                totals = DailyTotals(self.ledger.directory, date_str)
+                totals.rebuild(self.ledger.read(date_str))
+            else:
+                totals = verified[date_str]
+                for record in group:
+                    totals.add(record)
+            totals.ledger_size = self.ledger.size(date_str)
+            self._totals = {date_str: totals}
+            try:
+                totals.save()
+            except Exception as e:
+                # The ledger is authoritative; the next load sees the mismatch and rebuilds
+                logging.error(f"Could not save totals for {date_str}: {e}")
+                self._totals.pop(date_str, None)
+
+    def _export(self, date_str):
+        """Export one day's workbook; returns False if it should be retried."""
+        try:
+            path = self.ledger.export_xlsx(date_str)
+            self._results.put(("exported", path))
+        except PermissionError:
+            logging.error(f"Cannot write the Excel file for {date_str}; it might be open in Excel")
+            return False
+        except Exception as e:
+            logging.exception("Excel export failed")
+            self._results.put(("error", f"Error exporting Excel file: {e}"))
+        return True
@@ -1,23 +1,24 @@
-import sys
 import os
+import sys
+
+# Shared modules (startup timing, the ledger) live in the repository root, one level up
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+from startup import StartupProfile, prewarm
+
+# Created before the other imports so --startup-profile includes them
+STARTUP = StartupProfile()
+
 import json
 import logging
 from datetime import datetime
 import customtkinter as ctk
 from tkinter import messagebox, ttk
 import tkinter as tk
-from openpyxl import Workbook, load_workbook
-import win32print
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
-import subprocess
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import Paragraph, Table, TableStyle
-from reportlab.lib import colors
+from ledger import DailyLedger, new_invoice_key
+# openpyxl, win32print, PIL, numpy and reportlab are imported where they are
+# used (save, print); PREWARM_MODULES loads them in the background at startup
 
 # Configure logging
 logging.basicConfig(
@@ -26,6 +27,11 @@ logging.basicConfig(
     filename='invoice_print.log'
 )
 
+# Startup
+PREWARM_MODULES = ("openpyxl", "PIL.Image", "numpy", "win32print", "reportlab.pdfgen.canvas", "reportlab.platypus")
+
+STARTUP.mark("imports")
+
 # Constants
 PRIMARY_COLOR = "#2B2D42"
 SECONDARY_COLOR = "#8D99AE"
@@ -551,6 +557,9 @@ class PrintPreviewDialog(ctk.CTkToplevel):
 
     def print_as_image(self):
         """Render invoice using template image and overlay dynamic content."""
+        from PIL import Image, ImageDraw, ImageFont
+        import win32print
+
         # Image settings
         font_size = 18
         line_height = font_size + 5
@@ -705,6 +714,7 @@ class PrintPreviewDialog(ctk.CTkToplevel):
 class InvoiceWindow(ctk.CTk):
     def __init__(self):
         super().__init__()
+        STARTUP.mark("tk root")
         self.title("G.V. Mahant Brothers - Invoice")
         self.geometry("1200x800")
         self.configure(fg_color=BACKGROUND_COLOR)
@@ -720,6 +730,17 @@ class InvoiceWindow(ctk.CTk):
         self._setup_table()
         self._setup_bottom_section()
         self.switch_mode("Patti")
+        # Saves append to the day's ledger; the workbook is written on Export and on exit
+        self.ledger = DailyLedger()
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        STARTUP.mark("build ui")
+        self.after_idle(self._on_first_idle)
+
+    def _on_first_idle(self):
+        """The window is drawn: report startup time and warm up the save/print imports."""
+        STARTUP.mark("first idle")
+        STARTUP.report()
+        prewarm(PREWARM_MODULES, STARTUP)
 
     def _setup_header(self):
         self.header_frame = ctk.CTkFrame(self.main_frame, fg_color=PRIMARY_COLOR)
@@ -803,6 +824,15 @@ class InvoiceWindow(ctk.CTk):
             font=BUTTON_FONT
         )
         save_btn.pack(side="left", padx=5)
+        export_btn = ctk.CTkButton(
+            self.bottom_frame,
+            text="Export Excel",
+            command=self.export_excel,
+            fg_color=PRIMARY_COLOR,
+            hover_color=SECONDARY_COLOR,
+            font=BUTTON_FONT
+        )
+        export_btn.pack(side="left", padx=5)
         
         print_btn = ctk.CTkButton(
             self.bottom_frame,
@@ -842,46 +872,62 @@ class InvoiceWindow(ctk.CTk):
 
     def save_to_excel(self):
         try:
-            home_dir = os.path.expanduser("~")
-            documents_path = os.path.join(home_dir, "Documents")
-            os.makedirs(documents_path, exist_ok=True)
-            date_str = datetime.now().strftime('%Y-%m-%d')
-            base_filename = f"Invoice_{date_str}.xlsx"
-            full_save_path = os.path.join(documents_path, base_filename)
             customer = self.customer_entry.get().strip() or "Unknown Customer"
             mode = self.current_mode
-            headers = MODE_HEADERS[mode]
-            data_rows = self.table.get_all_data()
+            headers = [h for h in MODE_HEADERS[mode] if h]
+            data_rows = [
+                [v.replace('₹', '') for v in row]
+                for row in self.table.get_all_data()
+            ]
             if not data_rows:
                 messagebox.showwarning("No Data", "No data entered to save.")
                 return
+            # One JSON line appended to the day's ledger; earlier invoices are never reread
+            record = {
+                "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "customer": customer,
+                "mode": mode,
+                "headers": headers,
+                "rows": data_rows,
+                "invoice_key": new_invoice_key(),
+            }
+            if mode == "Kata" and getattr(self, "kata_amount_entry", None) is not None:
+                record["kata_amount"] = safe_float(self.kata_amount_entry.get())
             try:
-                if os.path.exists(full_save_path):
-                    wb = load_workbook(full_save_path)
-                else:
-                    wb = Workbook()
-                if mode in wb.sheetnames:
-                    ws = wb[mode]
-                else:
-                    if len(wb.sheetnames) > 0:
-                        ws = wb.create_sheet(title=mode)
-                    else:
-                        ws = wb.active
-                        ws.title = mode
-                ws.delete_rows(1, ws.max_row)
-                ws.append(["Timestamp", "Customer"] + headers)
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                for row in data_rows:
-                    ws.append([timestamp, customer] + row)
-                wb.save(full_save_path)
-                messagebox.showinfo("Saved", f"Invoice data saved to:\n{full_save_path}\n(Sheet: {mode})")
-            except PermissionError:
-                messagebox.showerror("Permission Error", f"Cannot save '{base_filename}'.\nThe file might be open in Excel.\n\nLocation: {documents_path}")
+                self.ledger.append(record)
+                self.ledger.sync()
+                messagebox.showinfo("Saved", f"Invoice saved to:\n{self.ledger.ledger_path(record['timestamp'][:10])}\nUse Export Excel for the day's workbook.")
             except Exception as e:
-                messagebox.showerror("Save Error", f"Error saving Excel file to:\n{full_save_path}\n\nError: {str(e)}")
+                logging.exception("Saving to the ledger failed")
+                messagebox.showerror("Save Error", f"Error saving invoice:\n\n{str(e)}")
         except Exception as e:
             messagebox.showerror("Error", f"Unexpected error during save operation: {str(e)}")
 
+    def export_excel(self):
+        """Write today's ledger out as Invoice_<date>.xlsx."""
+        try:
+            path = self.ledger.export_xlsx()
+        except PermissionError:
+            messagebox.showerror("Permission Error", "Cannot write today's Excel file.\nThe file might be open in Excel.")
+            return
+        except Exception as e:
+            logging.exception("Excel export failed")
+            messagebox.showerror("Export Error", f"Error exporting Excel file:\n\n{str(e)}")
+            return
+        if path:
+            messagebox.showinfo("Exported", f"Invoices exported to:\n{path}")
+        else:
+            messagebox.showinfo("Exported", "No invoices saved today.")
+
+    def on_closing(self):
+        """Export the day's workbook before closing."""
+        try:
+            self.ledger.export_xlsx()
+        except Exception as e:
+            logging.error(f"Could not export the day's workbook on exit: {e}")
+        self.ledger.close()
+        self.destroy()
+
     def show_print_preview(self):
         """Show a preview of the invoice before printing."""
         try:
@@ -980,6 +1026,9 @@ class InvoiceWindow(ctk.CTk):
 
 def test_font_support(font, test_text):
     """Test if the font can render the given text without boxes."""
+    from PIL import Image, ImageDraw
+    import numpy as np
+
     try:
         # Create a small image to test rendering
         img = Image.new('1', (100, 100), 1)  # White background
@@ -0,0 +1,85 @@
+"""Coalesced recalculation for the invoice table.
+
+Every keystroke asks for a recalculation, but a fast typist produces
+several KeyRelease events between two redraws. ``RecalcScheduler``
+collects the requests and runs the callback once per Tk idle cycle; a
+``max_delay`` timer guarantees a run even while the event queue never
+drains. The ``requested`` and ``runs`` counters show how much work was
+merged away.
+"""
+
+
+class RecalcScheduler:
+    """Merges recalculation requests into one run per idle cycle.
+
+    Args:
+        widget: Any Tk widget, used for ``after_idle``/``after``.
+        callback (callable): Called with the list of items requested since
+            the last run, or None when a full recalculation was requested.
+        max_delay (int): Longest wait in ms before a pending run is forced;
+            0 relies on the idle cycle alone.
+    """
+
+    def __init__(self, widget, callback, max_delay=100):
+        self.widget = widget
+        self.callback = callback
+        self.max_delay = max_delay
+        self.requested = 0
+        self.runs = 0
+        self._pending = {}  # id(item) -> item
+        self._full = False
+        self._idle_id = None
+        self._deadline_id = None
+
+    @property
+    def pending(self):
+        """True while a run is scheduled."""
+        return self._idle_id is not None
+
+    def request(self, item=None):
+        """Ask for ``item`` (or everything, if None) to be recalculated."""
+        self.requested += 1
+        if item is None:
+            self._full = True
+            self._pending.clear()
+        elif not self._full:
+            self._pending[id(item)] = item
+        if self._idle_id is None:
+            self._idle_id = self.widget.after_idle(self._run)
+            if self.max_delay:
+                self._deadline_id = self.widget.after(self.max_delay, self._run)
+
+    def discard(self, item):
+        """Forget a pending request for ``item`` (e.g. its row was deleted)."""
+        self._pending.pop(id(item), None)
+
+    def flush(self):
+        """Run a pending recalculation now, before something reads the results."""
+        if self._idle_id is not None:
+            self._run()
+
+    def cancel(self):
+        """Drop whatever is pending without running it."""
+        self._cancel_timers()
+        self._pending.clear()
+        self._full = False
+
+    def stats(self):
+        """Counters for diagnostics: requests received versus runs made."""
+        return {"requested": self.requested, "runs": self.runs}
+
+    def _cancel_timers(self):
+        for after_id in (self._idle_id, self._deadline_id):
+            if after_id is not None:
+                self.widget.after_cancel(after_id)
+        self._idle_id = None
+        self._deadline_id = None
+
+    def _run(self):
+        # Whichever of the idle callback and the deadline fires first wins
+        self._cancel_timers()
+        items = None if self._full else list(self._pending.values())
+        self._pending.clear()
+        self._full = False
+        self.runs += 1
+        self.callback(items)
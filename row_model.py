@@ -0,0 +1,74 @@
+"""Parsed state of the invoice table, kept apart from the Tk widgets.
+
+Each table row has a ``RowModel`` holding the text typed into every cell,
+the fixed-point value parsed from it and the last calculated result. An
+edit parses the one changed cell; recalculation, save and print read the
+model and never go back to ``.get()`` on the widgets.
+"""
+from invoice_engine import MODE_FIELDS, RowResult, calculate_fixed, field_scales, format_money, to_fixed
+
+EMPTY_RESULT = RowResult(0, 0, 0, 0)
+
+
+class RowModel:
+    """One invoice row: item, raw cell text, parsed values and result."""
+
+    __slots__ = ("mode", "item", "texts", "values", "result", "_scales", "_dirty")
+
+    def __init__(self, mode):
+        self.mode = mode
+        self._scales = field_scales(mode) if mode in MODE_FIELDS else []
+        self.item = ""
+        self.texts = [""] * len(self._scales)
+        self.values = [0] * len(self._scales)
+        self.result = EMPTY_RESULT
+        self._dirty = False
+
+    @property
+    def amount(self):
+        """Last calculated amount in paise."""
+        return self.result.amount
+
+    def set_text(self, index, text):
+        """Record the text of input field ``index`` (0 is the first field after Item).
+
+        Returns:
+            bool: True if the parsed value changed and the row needs recalculating.
+        """
+        if text == self.texts[index]:
+            return False
+        self.texts[index] = text
+        value = to_fixed(text, self._scales[index])
+        if value == self.values[index]:
+            return False  # e.g. "5" -> "5." or "05"
+        self.values[index] = value
+        self._dirty = True
+        return True
+
+    def load(self, item, texts):
+        """Replace the whole row, e.g. from a widget resync or a saved invoice."""
+        self.item = item
+        for index in range(len(self.texts)):
+            self.set_text(index, texts[index] if index < len(texts) else "")
+        self._dirty = True
+
+    def clear(self):
+        """Empty the row."""
+        self.load("", [])
+
+    def recalculate(self):
+        """Recalculate if any value changed since the last run.
+
+        Returns:
+            int: The change in the row's amount, in paise.
+        """
+        if not self._dirty:
+            return 0
+        previous = self.result.amount
+        self.result = calculate_fixed(self.mode, self.values) if self._scales else EMPTY_RESULT
+        self._dirty = False
+        return self.result.amount - previous
+
+    def as_row(self):
+        """The row as saved: item, the input texts, then the formatted amount."""
+        return [self.item] + self.texts + [format_money(self.result.amount)]
@@ -0,0 +1,84 @@
+"""Startup timing and deferred imports for the desktop apps.
+
+The counter PCs are old and a cold start is dominated by imports. The apps
+import printing and spreadsheet libraries only where they are used and
+call ``prewarm`` once the window is up, so the first Save or Print does
+not pay for them either. ``StartupProfile`` records how long each startup
+phase took; with ``--startup-profile`` on the command line the phases are
+logged and checked against a time budget.
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+
+PROFILE_FLAG = "--startup-profile"
+STARTUP_BUDGET = 2.0  # seconds from process start to the first idle mainloop
+
+
+class StartupProfile:
+    """Wall-clock time of each startup phase.
+
+    Args:
+        enabled (bool): Log the phases in ``report``; marks are always recorded.
+        budget (float): Seconds the whole startup may take before a warning.
+    """
+
+    def __init__(self, enabled=None, budget=STARTUP_BUDGET):
+        self.enabled = PROFILE_FLAG in sys.argv if enabled is None else enabled
+        self.budget = budget
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = []
+
+    def mark(self, phase):
+        """Close the current phase under the name ``phase``."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        """Seconds from the profile's creation to the last mark."""
+        return self._last - self.started
+
+    def report(self):
+        """Log each phase and the total when profiling is enabled.
+
+        Returns:
+            bool: True if startup stayed within the budget.
+        """
+        within = self.total <= self.budget
+        if self.enabled:
+            for phase, seconds in self.phases:
+                logging.info(f"Startup {phase:<20} {seconds * 1000:8.1f} ms")
+            logging.info(f"Startup {'total':<20} {self.total * 1000:8.1f} ms (budget {self.budget * 1000:.0f} ms)")
+            if not within:
+                logging.warning(f"Startup took {self.total:.2f}s, over the {self.budget:.2f}s budget")
+        return within
+
+
+def prewarm(modules, profile=None):
+    """Import ``modules`` on a daemon thread so their first use is instant.
+
+    Missing modules are skipped (e.g. the win32 printing modules on a
+    development machine); the import at the point of use reports them.
+
+    Returns:
+        threading.Thread: The started thread.
+    """
+    def run():
+        for name in modules:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                logging.debug(f"Prewarm skipped {name}: {e}")
+                continue
+            if profile is not None and profile.enabled:
+                logging.info(f"Prewarmed {name:<17} {(time.perf_counter() - started) * 1000:8.1f} ms")
+
+    thread = threading.Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
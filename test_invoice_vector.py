@@ -0,0 +1,76 @@
+"""The NumPy path must give exactly the scalar engine's results, in and out of int64 range.
+
+Run with ``python -m pytest test_invoice_vector.py``; skipped without NumPy.
+"""
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import invoice_vector  # noqa: E402
+from benchmark_engine import generate_rows  # noqa: E402
+from invoice_engine import MODES, calculate_rows  # noqa: E402
+
+
+def scalar_columns(mode, rows):
+    return [list(column) for column in zip(*calculate_rows(mode, rows))]
+
+
+def vector_columns(mode, rows):
+    return [[int(value) for value in column] for column in invoice_vector.calculate_rows(mode, rows)]
+
+
+def fits(mode, text):
+    """Whether a row with every field set to ``text`` passes the range guard."""
+    fields = MODES[mode].field_names
+    columns = invoice_vector.columns_from_rows(mode, [["Rice"] + [text] * len(fields)])
+    return invoice_vector.fits_int64(mode, [columns[field] for field in fields])
+
+
+@pytest.mark.parametrize("mode", list(MODES))
+def test_random_rows_match_scalar(mode):
+    rows = generate_rows(mode, 5000, seed=11)
+    assert vector_columns(mode, rows) == scalar_columns(mode, rows)
+
+
+@pytest.mark.parametrize("mode", list(MODES))
+def test_large_random_rows_match_scalar(mode):
+    rng = random.Random(f"large-{mode}")
+    width = len(MODES[mode].field_names)
+    for _ in range(50):
+        rows = [
+            ["Rice"] + [str(rng.randint(-10 ** rng.randint(0, 12), 10 ** rng.randint(0, 12))) for _ in range(width)]
+            for _ in range(rng.randint(1, 20))
+        ]
+        assert vector_columns(mode, rows) == scalar_columns(mode, rows)
+
+
+def test_overflowing_product_is_exact():
+    # 1e9 kg at Rs 1e6: the amount is 1e17 paise, but weight x rate is 1e20 in fixed point
+    rows = [["Rice", "1", "1000000000", "1000000", ""]]
+    assert vector_columns("Patti", rows) == scalar_columns("Patti", rows)
+    assert int(invoice_vector.calculate_rows("Patti", rows).amount[0]) == 10 ** 17
+
+
+def test_values_beyond_int64_are_exact():
+    rows = [["Rice", "1e30", "0", "1", "0"], ["Rice", "100", "2", "25", "10"]]
+    result = invoice_vector.calculate_rows("Kata", rows)
+    assert [[int(value) for value in column] for column in result] == scalar_columns("Kata", rows)
+    assert result.total() == sum(row.amount for row in calculate_rows("Kata", rows))
+
+
+@pytest.mark.parametrize("mode", list(MODES))
+def test_range_boundary(mode):
+    # Largest all-fields value the guard lets through to int64, found by bisection
+    low, high = 1, 10 ** 15
+    assert fits(mode, str(low)) and not fits(mode, str(high))
+    while high - low > 1:
+        middle = (low + high) // 2
+        if fits(mode, str(middle)):
+            low = middle
+        else:
+            high = middle
+    for value in (low - 1, low, high, high + 1):
+        rows = [["Rice"] + [str(value)] * len(MODES[mode].field_names)]
+        assert vector_columns(mode, rows) == scalar_columns(mode, rows)
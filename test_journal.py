@@ -0,0 +1,44 @@
+"""A torn last line from a crash must not swallow the next record appended.
+
+Run with ``python -m pytest test_journal.py``.
+"""
+import json
+
+from journal import WriteAheadJournal
+from ledger import DailyLedger
+
+
+def record(customer, invoice_no):
+    return {
+        "timestamp": "2024-05-01 10:00:00",
+        "customer": customer,
+        "mode": "Patti",
+        "headers": ["Item", "Packet", "Quantity", "Rate", "Hamali", "Amount"],
+        "rows": [["Rice", "1", "10", "25", "5", "255.00"]],
+        "invoice_no": invoice_no,
+    }
+
+
+def test_journal_append_after_torn_tail(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(json.dumps({"seq": 1, "record": record("Ravi", 1)}) + "\n" + '{"seq": 2, "rec', encoding="utf-8")
+    journal = WriteAheadJournal(str(path))
+    assert [seq for seq, _ in journal.pending()] == [1]
+    seq = journal.append(record("Suma", 3))
+    journal.close()
+    reopened = WriteAheadJournal(str(path))
+    assert [(s, r["customer"]) for s, r in reopened.pending()] == [(1, "Ravi"), (seq, "Suma")]
+    reopened.close()
+
+
+def test_ledger_append_after_torn_tail(tmp_path):
+    ledger = DailyLedger(str(tmp_path))
+    ledger.append(record("Ravi", 1))
+    ledger.close()
+    path = tmp_path / "Invoice_2024-05-01.jsonl"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"timestamp": "2024-05-01 10:05:00", "cust')
+    ledger = DailyLedger(str(tmp_path))
+    ledger.append(record("Suma", 3))
+    ledger.close()
+    assert [r["customer"] for r in DailyLedger(str(tmp_path)).read("2024-05-01")] == ["Ravi", "Suma"]
@@ -0,0 +1,167 @@
+"""Virtualised invoice table: a fixed pool of row widgets over the row models.
+
+Building a Combobox, the entries, an amount label and a delete button for
+every invoice line makes a 150-line invoice slow to build and to scroll.
+``VirtualGrid`` keeps only as many widget rows as fit in the viewport and
+binds them to whichever rows are scrolled into view, so widget count,
+memory and scroll cost do not grow with the invoice.
+
+The grid knows nothing about the look of a row: the app passes a
+``build_slot`` callback that creates (and grids) one row of widgets and a
+``bind_slot`` callback that shows a row's model in them. Widgets are never
+destroyed while the table lives: rows that go away just unbind their slot.
+Each mode has its own grid, so a slot's columns never change.
+"""
+
+
+class Slot:
+    """One pooled row of widgets and the table row currently shown in it."""
+
+    __slots__ = ("widgets", "row", "visible")
+
+    def __init__(self):
+        self.widgets = []
+        self.row = None
+        self.visible = True
+
+
+class VirtualGrid:
+    """Shows a window of ``rows`` in a pool of widget rows sized to the viewport.
+
+    Args:
+        body: Frame the header and the pooled rows are gridded into.
+        scrollbar: ``CTkScrollbar`` beside ``body``; the grid drives it.
+        build_slot (callable): ``build_slot(slot, grid_row)`` creates the
+            slot's widgets, grids them on ``grid_row`` and stores them in
+            ``slot.widgets``.
+        bind_slot (callable): ``bind_slot(slot, row)`` shows ``row`` in the
+            slot's widgets.
+        row_height (int): Height of one table row in pixels, padding included.
+    """
+
+    def __init__(self, body, scrollbar, build_slot, bind_slot, row_height=44):
+        self.body = body
+        self.scrollbar = scrollbar
+        self.build_slot = build_slot
+        self.bind_slot = bind_slot
+        self.row_height = row_height
+        self.rows = []
+        self.slots = []
+        self.first = 0      # index of the row shown in the first slot
+        self.capacity = 1   # slots that fit in the viewport
+        self._slot_of = {}  # id(row) -> offset of the slot showing it
+
+        # The viewport decides the size; the pool never pushes it wider or taller
+        self.body.grid_propagate(False)
+        self.scrollbar.configure(command=self._on_scrollbar)
+        self.body.bind("<Configure>", self._on_resize, add="+")
+        self.body.bind_all("<MouseWheel>", self._on_mousewheel, add="+")
+        self.body.bind_all("<Button-4>", self._on_mousewheel, add="+")
+        self.body.bind_all("<Button-5>", self._on_mousewheel, add="+")
+
+    def set_rows(self, rows):
+        """Show a new list of rows (the grid keeps a reference, not a copy)."""
+        self.rows = rows
+        self.first = 0
+        self.render(rebind=True)
+
+    def render(self, rebind=False):
+        """Bind the visible rows to the pool; with ``rebind`` refresh every slot."""
+        total = len(self.rows)
+        self.first = max(0, min(self.first, total - self.capacity))
+        while len(self.slots) < min(self.capacity, total):
+            slot = Slot()
+            self.build_slot(slot, len(self.slots) + 1)
+            self.slots.append(slot)
+        self._slot_of = {}
+        for offset, slot in enumerate(self.slots):
+            index = self.first + offset
+            if offset < self.capacity and index < total:
+                row = self.rows[index]
+                if rebind or slot.row is not row:
+                    slot.row = row
+                    self.bind_slot(slot, row)
+                self._slot_of[id(row)] = offset
+                if not slot.visible:
+                    for widget in slot.widgets:
+                        widget.grid()
+                    slot.visible = True
+            else:
+                slot.row = None
+                if slot.visible:
+                    for widget in slot.widgets:
+                        widget.grid_remove()
+                    slot.visible = False
+        self._update_scrollbar()
+
+    def refresh(self, row):
+        """Redraw ``row`` if it is on screen (e.g. after its amount changed)."""
+        slot = self.slot_for(row)
+        if slot is not None:
+            self.bind_slot(slot, row)
+
+    def slot_for(self, row):
+        """The slot showing ``row``, or None while it is scrolled out of view."""
+        offset = self._slot_of.get(id(row))
+        return None if offset is None else self.slots[offset]
+
+    def index_of(self, row):
+        """Position of ``row`` in ``rows``; constant time while it is on screen.
+
+        Raises:
+            ValueError: If ``row`` is not in the table.
+        """
+        offset = self._slot_of.get(id(row))
+        if offset is not None:
+            return self.first + offset
+        for index, candidate in enumerate(self.rows):
+            if candidate is row:
+                return index
+        raise ValueError("Row is not in the table")
+
+    def show(self, index):
+        """Scroll so that row ``index`` is visible."""
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + self.capacity:
+            self.first = index - self.capacity + 1
+        self.render()
+
+    def scroll(self, rows):
+        """Scroll by ``rows`` (negative is up)."""
+        self.first += rows
+        self.render()
+
+    def _update_scrollbar(self):
+        total = len(self.rows)
+        if total <= self.capacity:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.first / total, (self.first + self.capacity) / total)
+
+    def _on_resize(self, event):
+        # One slot row is taken by the headers
+        capacity = max(1, event.height // self.row_height - 1)
+        if capacity != self.capacity:
+            self.capacity = capacity
+            self.render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.first = round(float(amount) * len(self.rows))
+        elif unit == "pages":
+            self.first += round(float(amount)) * self.capacity
+        else:
+            self.first += round(float(amount))
+        self.render()
+
+    def _on_mousewheel(self, event):
+        # bind_all sees every wheel event; only scroll while over the table
+        widget = self.body.winfo_containing(event.x_root, event.y_root)
+        body = str(self.body)
+        if widget is None or not (str(widget) == body or str(widget).startswith(body + ".")):
+            return
+        if event.num == 4 or event.delta > 0:
+            self.scroll(-3)
+        elif event.num == 5 or event.delta < 0:
+            self.scroll(3)